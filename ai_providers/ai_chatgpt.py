@@ -7,6 +7,7 @@ import base64
 import os
 from datetime import datetime
 import time # 引入 time 模块
+import threading
 
 import httpx
 from openai import APIConnectionError, APIError, AuthenticationError, OpenAI
@@ -18,6 +19,9 @@ except ImportError:
     MessageSummary = object # Fallback if import fails or for simplified typing
 
 
+# 支持图片理解的模型（名称中带 -vision 的模型也视为支持）
+VISION_MODELS = frozenset({"gpt-4-vision-preview", "gpt-4o", "gpt-4.1-mini"})
+
 class ChatGPT():
     def __init__(self, conf: dict, message_summary_instance: MessageSummary = None, bot_wxid: str = None) -> None:
         key = conf.get("key")
@@ -42,7 +46,14 @@ class ChatGPT():
             self.client = OpenAI(api_key=key, base_url=api)
 
         self.system_content_msg = {"role": "system", "content": prompt if prompt else "You are a helpful assistant."} # 提供默认值
-        self.support_vision = self.model == "gpt-4-vision-preview" or self.model == "gpt-4o" or "-vision" in self.model
+        # 是否支持图片理解，只在初始化时判断一次
+        self.support_vision = self.model in VISION_MODELS or "-vision" in self.model
+        # 记录当前线程最近一次调用是否成功（出错时返回的是错误提示，调用方不应缓存）
+        self._call_state = threading.local()
+
+    def last_call_ok(self) -> bool:
+        """当前线程最近一次 get_answer / get_answer_stream 是否正常完成"""
+        return getattr(self._call_state, "ok", False)
 
     def __repr__(self):
         return 'ChatGPT'
@@ -56,7 +67,8 @@ class ChatGPT():
                 return True
         return False
 
-    def get_answer(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> str:
+    def _build_messages(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> list:
+        """构建发送给API的消息列表（系统提示、历史消息、当前问题）"""
         # 获取并格式化数据库历史记录 
         api_messages = []
 
@@ -103,8 +115,13 @@ class ChatGPT():
         # 3. 添加当前用户问题
         if question: # 确保问题非空
             api_messages.append({"role": "user", "content": question})
+        return api_messages
+
+    def get_answer(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> str:
+        api_messages = self._build_messages(question, wxid, system_prompt_override, specific_max_history)
 
         rsp = ""
+        self._call_state.ok = False
         try:
             # 使用格式化后的 api_messages 
             params = {
@@ -120,6 +137,7 @@ class ChatGPT():
             rsp = ret.choices[0].message.content
             rsp = rsp[2:] if rsp.startswith("\n\n") else rsp
             rsp = rsp.replace("\n\n", "\n")
+            self._call_state.ok = True
 
         except AuthenticationError:
             self.LOG.error("OpenAI API 认证失败，请检查 API 密钥是否正确")
@@ -136,6 +154,59 @@ class ChatGPT():
 
         return rsp
 
+    def get_answer_stream(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None):
+        """流式获取回答，逐段产出文本增量；出错时若尚未产出内容则产出错误信息"""
+        api_messages = self._build_messages(question, wxid, system_prompt_override, specific_max_history)
+
+        params = {
+            "model": self.model,
+            "messages": api_messages,
+            "stream": True
+        }
+        # 只有非o系列模型才设置temperature
+        if not self.model.startswith("o"):
+            params["temperature"] = 0.2
+
+        self._call_state.ok = False
+        produced = False
+        carry = "" # 末尾的换行留到下一段，以便跨分段合并连续空行（与 get_answer 的处理一致）
+        try:
+            for chunk in self.client.chat.completions.create(**params):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                text = carry + delta
+                carry = "\n" if text.endswith("\n") else ""
+                if carry:
+                    text = text[:-1]
+                if not produced and text.startswith("\n\n"):
+                    text = text[2:]
+                text = text.replace("\n\n", "\n")
+                if text:
+                    produced = True
+                    yield text
+            if carry and produced:
+                yield carry
+            self._call_state.ok = True
+        except AuthenticationError:
+            self.LOG.error("OpenAI API 认证失败，请检查 API 密钥是否正确")
+            if not produced:
+                yield "API认证失败"
+        except APIConnectionError:
+            self.LOG.error("无法连接到 OpenAI API，请检查网络连接")
+            if not produced:
+                yield "网络连接错误"
+        except APIError as e1:
+            self.LOG.error(f"OpenAI API 返回了错误：{str(e1)}")
+            if not produced:
+                yield f"API错误: {str(e1)}"
+        except Exception as e0:
+            self.LOG.error(f"发生未知错误：{str(e0)}")
+            if not produced:
+                yield "发生未知错误"
+
     def encode_image_to_base64(self, image_path: str) -> str:
         """将图片文件转换为Base64编码
 
@@ -152,11 +223,11 @@ class ChatGPT():
             self.LOG.error(f"图片编码失败: {str(e)}")
             return ""
 
-    def get_image_description(self, image_path: str, prompt: str = "请详细描述这张图片中的内容") -> str:
+    def get_image_description(self, image_path, prompt: str = "请详细描述这张图片中的内容") -> str:
         """使用GPT-4 Vision分析图片内容
 
         Args:
-            image_path (str): 图片文件路径
+            image_path (str | bytes): 图片文件路径，或已读入内存的图片数据
             prompt (str, optional): 提示词. 默认为"请详细描述这张图片中的内容"
 
         Returns:
@@ -166,12 +237,16 @@ class ChatGPT():
             self.LOG.error(f"当前模型 {self.model} 不支持图片理解，请使用gpt-4-vision-preview或gpt-4o")
             return "当前模型不支持图片理解功能，请联系管理员配置支持视觉的模型（如gpt-4-vision-preview或gpt-4o）"
 
-        if not os.path.exists(image_path):
+        if isinstance(image_path, (bytes, bytearray)):
+            # 直接编码内存中的图片数据，无需再读文件
+            base64_image = base64.b64encode(image_path).decode('utf-8')
+        elif not os.path.exists(image_path):
             self.LOG.error(f"图片文件不存在: {image_path}")
             return "无法读取图片文件"
+        else:
+            base64_image = self.encode_image_to_base64(image_path)
 
         try:
-            base64_image = self.encode_image_to_base64(image_path)
             if not base64_image:
                 return "图片编码失败"
 
@@ -5,6 +5,7 @@
 import logging
 from datetime import datetime
 import time # 引入 time 模块
+import threading
 
 import httpx
 from openai import APIConnectionError, APIError, AuthenticationError, OpenAI
@@ -40,10 +41,16 @@ class DeepSeek():
             self.client = OpenAI(api_key=key, base_url=api)
 
         self.system_content_msg = {"role": "system", "content": prompt if prompt else "You are a helpful assistant."} # 提供默认值
+        # 记录当前线程最近一次调用是否成功（出错时返回的是错误提示，调用方不应缓存）
+        self._call_state = threading.local()
 
     def __repr__(self):
         return 'DeepSeek'
 
+    def last_call_ok(self) -> bool:
+        """当前线程最近一次 get_answer / get_answer_stream 是否正常完成"""
+        return getattr(self._call_state, "ok", False)
+
     @staticmethod
     def value_check(conf: dict) -> bool:
         if conf:
@@ -52,7 +59,8 @@ class DeepSeek():
                 return True
         return False
 
-    def get_answer(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> str:
+    def _build_messages(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> list:
+        """构建发送给API的消息列表（系统提示、历史消息、当前问题）"""
         # 获取并格式化数据库历史记录 
         api_messages = []
 
@@ -99,7 +107,12 @@ class DeepSeek():
         # 3. 添加当前用户问题
         if question:
             api_messages.append({"role": "user", "content": question})
+        return api_messages
+
+    def get_answer(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None) -> str:
+        api_messages = self._build_messages(question, wxid, system_prompt_override, specific_max_history)
 
+        self._call_state.ok = False
         try:
             # 使用格式化后的 api_messages 
             response = self.client.chat.completions.create(
@@ -108,7 +121,7 @@ class DeepSeek():
                 stream=False
             )
             final_response = response.choices[0].message.content
-
+            self._call_state.ok = True
 
             return final_response
 
@@ -119,6 +132,35 @@ class DeepSeek():
             self.LOG.error(f"发生未知错误：{str(e0)}")
             return "抱歉，处理您的请求时出现了错误"
 
+    def get_answer_stream(self, question: str, wxid: str, system_prompt_override=None, specific_max_history=None):
+        """流式获取回答，逐段产出文本增量；出错时若尚未产出内容则产出错误信息"""
+        api_messages = self._build_messages(question, wxid, system_prompt_override, specific_max_history)
+
+        self._call_state.ok = False
+        produced = False
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=api_messages,
+                stream=True
+            )
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    produced = True
+                    yield delta
+            self._call_state.ok = True
+        except (APIConnectionError, APIError, AuthenticationError) as e1:
+            self.LOG.error(f"DeepSeek API 返回了错误：{str(e1)}")
+            if not produced:
+                yield f"DeepSeek API 返回了错误：{str(e1)}"
+        except Exception as e0:
+            self.LOG.error(f"发生未知错误：{str(e0)}")
+            if not produced:
+                yield "抱歉，处理您的请求时出现了错误"
+
 
 if __name__ == "__main__":
     # --- 测试代码需要调整 ---
@@ -7,6 +7,7 @@
 from .wechat_bot import WeChatBot
 from .config import BotConfig
 from .plugin_manager import PluginManager
+from .wcf_client import LockedWcf
 
-__all__ = ['WeChatBot', 'BotConfig', 'PluginManager']
+__all__ = ['WeChatBot', 'BotConfig', 'PluginManager', 'LockedWcf']
 __version__ = "2.0.0"
\ No newline at end of file
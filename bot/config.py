@@ -4,12 +4,18 @@
 机器人配置管理
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, FrozenSet
 from dataclasses import dataclass, field
 from pathlib import Path
 import yaml
 import logging
 
+# 优先使用 libyaml 的 C 实现解析，未编译 libyaml 时退回纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass
 class AIModelConfig:
@@ -42,7 +48,7 @@ class BotConfig:
     """机器人配置"""
     # 基础配置
     bot_name: str = "智能助手"
-    admin_users: List[str] = field(default_factory=list)
+    admin_users: FrozenSet[str] = frozenset()
     
     # AI配置
     ai_models: Dict[str, AIModelConfig] = field(default_factory=dict)
@@ -77,7 +83,7 @@ class BotConfig:
         
         try:
             with open(path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f) or {}
+                data = yaml.load(f, Loader=_YamlLoader) or {}
             
             # 解析AI模型配置
             ai_models = {}
@@ -90,8 +96,8 @@ class BotConfig:
                 groups[group_id] = GroupConfig(id=group_id, **config)
             
             return cls(
-                bot_name=data.get('bot_name', cls.bot_name),
-                admin_users=data.get('admin_users', []),
+                bot_name=str(data.get('bot_name', cls.bot_name)),
+                admin_users=frozenset(data.get('admin_users') or ()),
                 ai_models=ai_models,
                 default_ai_model=data.get('default_ai_model', cls.default_ai_model),
                 groups=groups,
@@ -116,7 +122,7 @@ class BotConfig:
         
         data = {
             'bot_name': self.bot_name,
-            'admin_users': self.admin_users,
+            'admin_users': sorted(self.admin_users),
             'ai_models': {
                 name: {
                     'enabled': config.enabled,
@@ -184,7 +184,7 @@ class MessageProcessor:
                 }
             })
             
-            self.logger.debug(f"消息分析完成: {text_content[:50]}...")
+            self.logger.debug("消息分析完成: %s...", text_content[:50])
             
         except Exception as e:
             state['error'] = str(e)
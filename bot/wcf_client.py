@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+线程安全的 Wcf 客户端包装
+"""
+
+import functools
+from threading import RLock
+from typing import Any
+
+
+class LockedWcf:
+    """
+    Wcf 客户端的请求/响应共用一条命令通道，不是线程安全的。
+    本包装持有一把锁，所有 Wcf 方法调用都经这把锁串行执行，
+    多个消息处理线程可以直接共用同一个实例。
+    """
+
+    # 只读取本地消息队列、不经过命令通道的方法不加锁（get_msg 会阻塞等待新消息，加锁会卡住其他调用）
+    _UNLOCKED_METHODS = frozenset({"get_msg", "is_receiving_msg"})
+
+    def __init__(self, wcf: Any) -> None:
+        self._wcf = wcf
+        self._lock = RLock()
+
+    @property
+    def lock(self) -> RLock:
+        """需要连续执行多个调用且中间不被打断时，可在外层持有此锁"""
+        return self._lock
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._wcf, name)
+        if not callable(attr) or name.startswith("_") or name in self._UNLOCKED_METHODS:
+            return attr
+
+        lock = self._lock
+
+        @functools.wraps(attr)
+        def locked_call(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+
+        # 缓存包装后的方法，之后的访问不再经过 __getattr__
+        setattr(self, name, locked_call)
+        return locked_call
@@ -4,12 +4,15 @@
 全新的微信机器人主类
 """
 
+import os
 import time
+import pickle
 import logging
 import signal
 import sys
 from queue import Empty
-from threading import Thread
+from threading import Thread, Lock, BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
 import re
@@ -21,6 +24,16 @@ from .events import EventBus, EventType
 from .message_processor import MessageProcessor
 from .ai_manager import AIManager
 from .plugin_manager import PluginManager
+from .wcf_client import LockedWcf
+
+# 联系人缓存文件（固定在项目目录下），按 Contact 表的行数、最大 rowid 与昵称总长度判断是否失效
+CONTACTS_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "contacts_cache.pkl")
+# 联系人缓存的最长有效期（秒），兜底签名无法察觉的昵称修改（如改为等长的昵称）
+CONTACTS_CACHE_MAX_AGE = 24 * 60 * 60
+
+# 消息处理通道数（每个通道单线程，同一会话固定进入同一通道以保证顺序），以及允许积压（处理中+排队）的最大消息数
+MSG_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+MSG_MAX_PENDING = MSG_WORKERS * 4
 
 
 class WeChatBot:
@@ -29,17 +42,26 @@ class WeChatBot:
     def __init__(self, config_path: str = "config.yaml"):
         # 加载配置
         self.config = BotConfig.from_file(config_path)
+        self._bot_name = self.config.bot_name
         
         # 初始化日志
         self.logger = logging.getLogger(__name__)
         
-        # 初始化微信客户端
-        self.wcf = Wcf(debug=False)
+        # 初始化微信客户端（消息在多个线程中处理，所有 Wcf 调用经包装内的锁串行执行）
+        self.wcf = LockedWcf(Wcf(debug=False))
         self.wxid = self.wcf.get_self_wxid()
         self.all_contacts = self._get_all_contacts()
         
-        # 消息发送频率控制
+        # 消息发送频率控制（并发发送时需加锁保护时间戳列表）
         self._msg_timestamps = []
+        self._msg_lock = Lock()
+        
+        # 普通消息按会话分到各单线程通道处理，接收线程只负责取消息；信号量用于积压过多时反压
+        self._msg_lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"MsgWorker-{i}")
+            for i in range(MSG_WORKERS)
+        ]
+        self._msg_slots = BoundedSemaphore(MSG_MAX_PENDING)
         
         # 初始化事件总线
         self.event_bus = EventBus()
@@ -66,13 +88,60 @@ class WeChatBot:
         self.logger.info("微信机器人初始化完成")
     
     def _get_all_contacts(self) -> Dict[str, str]:
-        """获取所有联系人"""
+        """获取所有联系人（Contact 表未变化时直接使用本地缓存）"""
+        signature = None
+        try:
+            rows = self.wcf.query_sql(
+                "MicroMsg.db",
+                "SELECT COUNT(*) AS cnt, MAX(rowid) AS max_rowid, TOTAL(LENGTH(NickName)) AS nick_len FROM Contact;"
+            )
+            if rows:
+                signature = (rows[0].get("cnt"), rows[0].get("max_rowid"), rows[0].get("nick_len"))
+        except Exception as e:
+            self.logger.warning(f"获取联系人表签名失败，将全量加载: {e}")
+        
+        if signature is not None:
+            cached = self._load_contacts_cache(signature)
+            if cached is not None:
+                self.logger.info(f"使用联系人缓存，共 {len(cached)} 个联系人")
+                return cached
+        
         try:
             contacts = self.wcf.query_sql("MicroMsg.db", "SELECT UserName, NickName FROM Contact;")
-            return {contact["UserName"]: contact["NickName"] for contact in contacts}
+            # wxid 会被反复用作字典键，驻留后可共享同一字符串对象
+            all_contacts = {sys.intern(contact["UserName"]): contact["NickName"] for contact in contacts}
         except Exception as e:
             self.logger.error(f"获取联系人失败: {e}")
             return {}
+        
+        if signature is not None:
+            self._save_contacts_cache(signature, all_contacts)
+        return all_contacts
+    
+    def _load_contacts_cache(self, signature: tuple) -> Optional[Dict[str, str]]:
+        """读取联系人缓存，签名不一致或读取失败时返回None"""
+        if not os.path.exists(CONTACTS_CACHE_PATH):
+            return None
+        try:
+            with open(CONTACTS_CACHE_PATH, "rb") as f:
+                cache = pickle.load(f)
+            if cache.get("signature") != signature:
+                return None
+            if time.time() - cache.get("saved_at", 0) > CONTACTS_CACHE_MAX_AGE:
+                return None
+            return {sys.intern(wxid): name for wxid, name in cache["contacts"].items()}
+        except Exception as e:
+            self.logger.warning(f"读取联系人缓存失败: {e}")
+            return None
+    
+    def _save_contacts_cache(self, signature: tuple, contacts: Dict[str, str]) -> None:
+        """保存联系人缓存"""
+        try:
+            os.makedirs(os.path.dirname(CONTACTS_CACHE_PATH), exist_ok=True)
+            with open(CONTACTS_CACHE_PATH, "wb") as f:
+                pickle.dump({"signature": signature, "saved_at": time.time(), "contacts": contacts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.logger.warning(f"保存联系人缓存失败: {e}")
     
     def _setup_event_listeners(self):
         """设置事件监听"""
@@ -128,6 +197,14 @@ class WeChatBot:
         self.running = False
         
         try:
+            # 先等待已提交的消息处理完成，之后才能卸载插件和AI模型
+            for lane in self._msg_lanes:
+                lane.shutdown(wait=True)
+            # 命令模块已加载时，其后台任务（如提醒解析）也要在卸载AI模型、关闭微信客户端之前结束
+            handlers_module = sys.modules.get("commands.handlers")
+            if handlers_module is not None:
+                handlers_module.shutdown_background_tasks()
+            
             # 发布停止事件
             self.event_bus.emit(EventType.BOT_STOPPED, {"timestamp": time.time()})
             
@@ -156,17 +233,29 @@ class WeChatBot:
             while self.running and self.wcf.is_receiving_msg():
                 try:
                     msg = self.wcf.get_msg()
-                    self.logger.debug(f"收到消息: {msg}")
+                    self.logger.debug("收到消息: %s", msg)
                     
-                    # 处理特殊消息类型
+                    # 处理特殊消息类型（留在接收线程，保证顺序）
                     if msg.type == 37:  # 好友请求
                         self._handle_friend_request(msg)
                     elif msg.type == 10000:  # 系统消息
                         self._handle_system_message(msg)
                     else:
-                        # 使用消息处理器处理普通消息
-                        result = self.message_processor.process_message(msg)
-                        self.logger.debug(f"消息处理完成: {result['current_state']}")
+                        # 普通消息按会话交给对应通道，积压达到上限时阻塞接收；停止后通道已关闭，不再提交
+                        if not self.running:
+                            break
+                        self._msg_slots.acquire()
+                        if not self.running:
+                            self._msg_slots.release()
+                            break
+                        try:
+                            chat_id = msg.roomid if msg.from_group() else msg.sender
+                            lane = self._msg_lanes[hash(chat_id) % len(self._msg_lanes)]
+                            future = lane.submit(self._dispatch_msg, msg)
+                        except Exception:
+                            self._msg_slots.release()
+                            raise
+                        future.add_done_callback(lambda _: self._msg_slots.release())
                     
                 except Empty:
                     continue
@@ -183,6 +272,20 @@ class WeChatBot:
         
         self.logger.info("消息接收已启动")
     
+    def _dispatch_msg(self, msg: WxMsg) -> None:
+        """在工作线程中处理普通消息"""
+        try:
+            # 使用消息处理器处理普通消息
+            result = self.message_processor.process_message(msg)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("消息处理完成: %s", result['current_state'])
+        except Exception as e:
+            self.logger.error(f"处理消息时出错: {e}")
+            self.event_bus.emit(
+                EventType.ERROR_OCCURRED,
+                {"error": str(e), "context": "message_processing"}
+            )
+    
     def _setup_signal_handlers(self) -> None:
         """设置信号处理"""
         def signal_handler(sig, frame):
@@ -228,7 +331,7 @@ class WeChatBot:
         # 比如发送启动通知给管理员等
         admin_users = self.config.admin_users
         if admin_users:
-            startup_msg = f"🤖 {self.config.bot_name} 已启动"
+            startup_msg = f"🤖 {self._bot_name} 已启动"
             for admin_id in admin_users:
                 self.send_text_message(startup_msg, admin_id)
     
@@ -293,7 +396,7 @@ class WeChatBot:
                     self.all_contacts[msg.sender] = friend_name
                     
                     # 发送打招呼消息
-                    greeting = f"Hi {friend_name}，我是{self.config.bot_name}，很高兴认识你！"
+                    greeting = f"Hi {friend_name}，我是{self._bot_name}，很高兴认识你！"
                     self.send_text_message(greeting, msg.sender)
                     
                     self.logger.info(f"已向新好友 {friend_name} 发送打招呼消息")
@@ -316,14 +419,9 @@ class WeChatBot:
                     text = f" @所有人\n\n{text}"
                     at_list = "notify@all"
                 else:
-                    ats = []
-                    for user_id in at_users:
-                        user_name = self.wcf.get_alias_in_chatroom(user_id, chat_id)
-                        ats.append(f"@{user_name}")
-                    
-                    if ats:
-                        text = f"{' '.join(ats)}\n\n{text}"
-                        at_list = ",".join(at_users)
+                    ats = [f"@{self.wcf.get_alias_in_chatroom(user_id, chat_id)}" for user_id in at_users]
+                    text = f"{' '.join(ats)}\n\n{text}"
+                    at_list = ",".join(at_users)
             
             # 发送消息
             self.wcf.send_text(text, chat_id, at_list)
@@ -341,21 +439,22 @@ class WeChatBot:
         if self.config.message_rate_limit <= 0:
             return True
         
-        current_time = time.time()
-        
-        # 清理过期的时间戳
-        self._msg_timestamps = [
-            ts for ts in self._msg_timestamps
-            if current_time - ts < 60
-        ]
-        
-        # 检查是否超过限制
-        if len(self._msg_timestamps) >= self.config.message_rate_limit:
-            return False
-        
-        # 记录当前时间戳
-        self._msg_timestamps.append(current_time)
-        return True
+        with self._msg_lock:
+            current_time = time.time()
+            
+            # 清理过期的时间戳
+            self._msg_timestamps = [
+                ts for ts in self._msg_timestamps
+                if current_time - ts < 60
+            ]
+            
+            # 检查是否超过限制
+            if len(self._msg_timestamps) >= self.config.message_rate_limit:
+                return False
+            
+            # 记录当前时间戳
+            self._msg_timestamps.append(current_time)
+            return True
     
     def run(self) -> None:
         """运行机器人（阻塞）"""
@@ -3,13 +3,21 @@ AI路由功能注册
 将需要通过AI路由的功能在这里注册
 """
 import re
-import json
-import os
 from typing import Optional, Match
 from datetime import datetime
 
 from .ai_router import ai_router
 from .context import MessageContext
+from .handlers import (
+    current_hm, reply_weather,
+    handle_reminder, handle_list_reminders, handle_delete_reminder,
+)
+
+# 以下模块依赖第三方库，导入失败时对应功能降级为提示错误
+try:
+    from function.func_news import News
+except ImportError:
+    News = None
 
 # ======== 天气功能 ========
 @ai_router.register(
@@ -25,43 +33,7 @@ def ai_handle_weather(ctx: MessageContext, params: str) -> bool:
         ctx.send_text("🤔 请告诉我你想查询哪个城市的天气")
         return True
     
-    # 加载城市代码
-    city_codes = {}
-    city_code_path = os.path.join(os.path.dirname(__file__), '..', 'function', 'main_city.json')
-    try:
-        with open(city_code_path, 'r', encoding='utf-8') as f:
-            city_codes = json.load(f)
-    except Exception as e:
-        if ctx.logger:
-            ctx.logger.error(f"加载城市代码文件失败: {e}")
-        ctx.send_text("⚠️ 抱歉，天气功能暂时不可用")
-        return True
-    
-    # 查找城市代码
-    city_code = city_codes.get(city_name)
-    if not city_code:
-        # 尝试模糊匹配
-        for name, code in city_codes.items():
-            if city_name in name:
-                city_code = code
-                city_name = name
-                break
-    
-    if not city_code:
-        ctx.send_text(f"😕 找不到城市 '{city_name}' 的天气信息")
-        return True
-    
-    # 获取天气信息
-    try:
-        from function.func_weather import Weather
-        weather_info = Weather(city_code).get_weather(include_forecast=True)
-        ctx.send_text(weather_info)
-        return True
-    except Exception as e:
-        if ctx.logger:
-            ctx.logger.error(f"获取天气信息失败: {e}")
-        ctx.send_text(f"😥 获取 {city_name} 天气时遇到问题")
-        return True
+    return reply_weather(ctx, city_name)
 
 # ======== 新闻功能 ========
 @ai_router.register(
@@ -73,7 +45,8 @@ def ai_handle_weather(ctx: MessageContext, params: str) -> bool:
 def ai_handle_news(ctx: MessageContext, params: str) -> bool:
     """AI路由的新闻查询处理"""
     try:
-        from function.func_news import News
+        if News is None:
+            raise ImportError("无法导入 func_news 模块")
         news_instance = News()
         is_today, news_content = news_instance.get_important_news()
         
@@ -102,13 +75,11 @@ def ai_handle_news(ctx: MessageContext, params: str) -> bool:
 def ai_handle_reminder_set(ctx: MessageContext, params: str) -> bool:
     """AI路由的提醒设置处理"""
     if not params.strip():
-        at_list = ctx.msg.sender if ctx.is_group else ""
+        at_list = ctx.at_list
         ctx.send_text("请告诉我需要提醒什么内容和时间呀~", at_list)
         return True
     
     # 调用原有的提醒处理逻辑
-    from .handlers import handle_reminder
-    
     # 临时修改消息内容以适配原有处理器
     original_content = ctx.msg.content
     ctx.msg.content = f"提醒我{params}"
@@ -129,7 +100,6 @@ def ai_handle_reminder_set(ctx: MessageContext, params: str) -> bool:
 )
 def ai_handle_reminder_list(ctx: MessageContext, params: str) -> bool:
     """AI路由的提醒列表查看处理"""
-    from .handlers import handle_list_reminders
     return handle_list_reminders(ctx, None)
 
 @ai_router.register(
@@ -141,8 +111,6 @@ def ai_handle_reminder_list(ctx: MessageContext, params: str) -> bool:
 def ai_handle_reminder_delete(ctx: MessageContext, params: str) -> bool:
     """AI路由的提醒删除处理"""
     # 调用原有的删除提醒逻辑
-    from .handlers import handle_delete_reminder
-    
     # 临时修改消息内容
     original_content = ctx.msg.content
     ctx.msg.content = f"删除提醒 {params}"
@@ -165,7 +133,7 @@ def ai_handle_reminder_delete(ctx: MessageContext, params: str) -> bool:
 def ai_handle_perplexity(ctx: MessageContext, params: str) -> bool:
     """AI路由的Perplexity搜索处理"""
     if not params.strip():
-        at_list = ctx.msg.sender if ctx.is_group else ""
+        at_list = ctx.at_list
         ctx.send_text("请告诉我你想搜索什么内容", at_list)
         return True
     
@@ -193,12 +161,10 @@ def ai_handle_perplexity(ctx: MessageContext, params: str) -> bool:
     
     # 如果Perplexity无法处理，使用默认AI
     if not was_handled and fallback_prompt:
-        chat_model = getattr(ctx, 'chat', None) or (getattr(ctx.robot, 'chat', None) if ctx.robot else None)
+        chat_model = ctx.chat
         if chat_model:
             try:
-                import time
-                current_time = time.strftime("%H:%M", time.localtime())
-                q_with_info = f"[{current_time}] {ctx.sender_name}: {params}"
+                q_with_info = f"[{current_hm()}] {ctx.sender_name}: {params}"
                 
                 rsp = chat_model.get_answer(
                     question=q_with_info,
@@ -207,7 +173,7 @@ def ai_handle_perplexity(ctx: MessageContext, params: str) -> bool:
                 )
                 
                 if rsp:
-                    at_list = ctx.msg.sender if ctx.is_group else ""
+                    at_list = ctx.at_list
                     ctx.send_text(rsp, at_list)
                     return True
             except Exception as e:
@@ -1,12 +1,29 @@
 import re
 import json
 import logging
-from typing import Dict, Callable, Optional, Any, Tuple
+from typing import Dict, Callable, Optional, Any, Tuple, List
 from dataclasses import dataclass, field
 from .context import MessageContext
 
 logger = logging.getLogger(__name__)
 
+# AI 回复的 JSON 解析优先使用 orjson，未安装时退回标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 路由提示词中每个功能最多保留的示例数和描述长度，控制提示词token数
+PROMPT_MAX_EXAMPLES = 2
+PROMPT_MAX_DESCRIPTION_LEN = 99
+
+# 以这些前缀开头的消息不可能是路由功能调用，直接跳过LLM判断
+SKIP_ROUTE_PREFIXES = ('/', '#', '!')
+
+# 从 AI 回复中截取最外层 JSON 对象
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
 @dataclass
 class AIFunction:
     """AI可调用的功能定义"""
@@ -22,6 +39,9 @@ class AIRouter:
     def __init__(self):
         self.functions: Dict[str, AIFunction] = {}
         self.logger = logger
+        # 按注册顺序压缩后的功能信息 (name, description, examples, params_description)，供构建提示词使用
+        self._functions_soa: List[Tuple[str, str, Tuple[str, ...], str]] = []
+        self._prompt_cache: Optional[str] = None
         
     def register(self, name: str, description: str, examples: list[str] = None, params_description: str = ""):
         """
@@ -46,13 +66,30 @@ class AIRouter:
                 params_description=params_description
             )
             self.functions[name] = ai_func
+            self._rebuild_functions_soa()
             self.logger.info(f"AI路由器注册功能: {name} - {description}")
             return func
         
         return decorator
     
+    def _rebuild_functions_soa(self) -> None:
+        """注册功能后重建压缩的功能列表，并使提示词缓存失效"""
+        self._functions_soa = [
+            (
+                func.name,
+                func.description[:PROMPT_MAX_DESCRIPTION_LEN],
+                tuple(func.examples[:PROMPT_MAX_EXAMPLES]),
+                func.params_description,
+            )
+            for func in self.functions.values()
+        ]
+        self._prompt_cache = None
+    
     def _build_ai_prompt(self) -> str:
-        """构建给AI的系统提示词，包含所有可用功能的信息"""
+        """构建给AI的系统提示词，包含所有可用功能的信息（注册表不变时复用缓存）"""
+        if self._prompt_cache is not None:
+            return self._prompt_cache
+        
         prompt = """你是一个智能路由助手。根据用户的输入，判断用户的意图并返回JSON格式的响应。
 
         ### 注意：
@@ -62,13 +99,15 @@ class AIRouter:
 
         ### 可用的功能列表：
         """
-        for name, func in self.functions.items():
-            prompt += f"\n- {name}: {func.description}"
-            if func.params_description:
-                prompt += f"\n  参数: {func.params_description}"
-            if func.examples:
-                prompt += f"\n  示例: {', '.join(func.examples[:3])}"
-            prompt += "\n"
+        lines = []
+        for name, description, examples, params_description in self._functions_soa:
+            lines.append(f"\n- {name}: {description}")
+            if params_description:
+                lines.append(f"\n  参数: {params_description}")
+            if examples:
+                lines.append(f"\n  示例: {', '.join(examples)}")
+            lines.append("\n")
+        prompt += "".join(lines)
         
         prompt += """
         请你分析用户输入，严格按照以下格式返回JSON：
@@ -98,6 +137,7 @@ class AIRouter:
         2. 只返回JSON，无需其他解释
         3. function_name 必须完全匹配上述功能列表中的名称
         """
+        self._prompt_cache = prompt
         return prompt
     
     def route(self, ctx: MessageContext) -> Tuple[bool, Optional[Dict[str, Any]]]:
@@ -108,15 +148,18 @@ class AIRouter:
         """
         print(f"[AI路由器] route方法被调用")
         
-        if not ctx.text:
+        text = ctx.text.strip() if ctx.text else ""
+        if not text:
             print("[AI路由器] ctx.text为空，返回False")
             return False, None
+        
+        # 快速预过滤：结构上不可能是功能调用的消息，省去一次LLM调用
+        if text.startswith(SKIP_ROUTE_PREFIXES):
+            print("[AI路由器] 消息不符合路由条件，跳过AI判断")
+            return False, None
             
         # 获取AI模型
-        chat_model = getattr(ctx, 'chat', None)
-        if not chat_model:
-            chat_model = getattr(ctx.robot, 'chat', None) if ctx.robot else None
-            
+        chat_model = ctx.chat
         if not chat_model:
             print("[AI路由器] 无可用的AI模型")
             self.logger.error("AI路由器：无可用的AI模型")
@@ -142,12 +185,12 @@ class AIRouter:
             print(f"[AI路由器] AI响应: {ai_response}")
             
             # 解析AI返回的JSON
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(ai_response)
             if not json_match:
                 self.logger.warning(f"AI路由器：无法从AI响应中提取JSON - {ai_response}")
                 return False, None
                 
-            decision = json.loads(json_match.group(0))
+            decision = _json_loads(json_match.group(0))
             
             # 验证决策格式
             action_type = decision.get("action_type")
@@ -162,7 +205,8 @@ class AIRouter:
                     self.logger.warning(f"AI路由器：未知的功能名 - {function_name}")
                     return False, None
             
-            self.logger.info(f"AI路由决策: {decision}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("AI路由决策: %s", decision)
             return True, decision
             
         except json.JSONDecodeError as e:
@@ -194,10 +238,10 @@ class AIRouter:
         current_group = ctx.get_receiver()
         
         if current_group in allowed_groups:
-            self.logger.info(f"群聊 {current_group} 在AI路由白名单中，允许使用")
+            self.logger.info("群聊 %s 在AI路由白名单中，允许使用", current_group)
             return True
         else:
-            self.logger.info(f"群聊 {current_group} 不在AI路由白名单中，禁止使用")
+            self.logger.info("群聊 %s 不在AI路由白名单中，禁止使用", current_group)
             return False
 
     def dispatch(self, ctx: MessageContext) -> bool:
@@ -239,7 +283,7 @@ class AIRouter:
                 return False
             
             try:
-                self.logger.info(f"AI路由器：调用功能 {function_name}，参数: {params}")
+                self.logger.info("AI路由器：调用功能 %s，参数: %s", function_name, params)
                 result = func.handler(ctx, params)
                 return result
             except Exception as e:
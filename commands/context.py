@@ -1,5 +1,6 @@
 import re
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Dict, Optional, Any
 
 
@@ -16,6 +17,7 @@ class MessageContext:
     robot_wxid: str            # 机器人自身的 wxid
     robot: Any = None          # Robot 实例，用于访问其方法和属性
     logger: Any = None         # 日志记录器
+    chat: Any = None           # 当前使用的AI模型 (未指定时从 robot.chat 解析)
 
     # 预处理字段
     text: str = ""             # 预处理后的纯文本消息 (去@, 去空格)
@@ -25,6 +27,13 @@ class MessageContext:
     
     # 懒加载字段
     _room_members: Optional[Dict[str, str]] = field(default=None, init=False, repr=False)
+    _name_to_wxid: Optional[Dict[str, str]] = field(default=None, init=False, repr=False)
+    _ai_query: Optional[str] = field(default=None, init=False, repr=False)  # 格式化后发给AI的消息 (见 handlers._format_ai_query)
+
+    def __post_init__(self):
+        # 构造时一次性解析AI模型，避免各 handler 反复 getattr 查找
+        if self.chat is None and self.robot is not None:
+            self.chat = getattr(self.robot, 'chat', None)
 
     @property
     def room_members(self) -> Dict[str, str]:
@@ -42,6 +51,21 @@ class MessageContext:
                 self._room_members = {}  # 出错时返回空字典
         return self._room_members
 
+    @property
+    def name_to_wxid(self) -> Dict[str, str]:
+        """群成员昵称到 wxid 的反向索引 (懒加载，重名时保留第一个)"""
+        if self._name_to_wxid is None:
+            index = {}
+            for wxid, name in self.room_members.items():
+                index.setdefault(name, wxid)
+            self._name_to_wxid = index
+        return self._name_to_wxid
+
+    @cached_property
+    def at_list(self) -> str:
+        """回复时需要@的用户 (群聊为发送者 wxid，私聊为空字符串)"""
+        return self.msg.sender if self.is_group else ""
+
     def get_sender_alias_or_name(self) -> str:
         """获取发送者在群里的昵称，如果获取失败或私聊，则返回其微信昵称"""
         if self.is_group:
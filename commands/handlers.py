@@ -1,69 +1,285 @@
 import re
 import random
-from typing import Optional, Match, Dict, Any
+from typing import Optional, Match, Dict, Any, List
 import json # 确保已导入json
 from datetime import datetime # 确保已导入datetime
 import os # 导入os模块用于文件路径操作
-# from function.func_duel import DuelRankSystem 
+import time
+import threading
+import functools
+from dataclasses import dataclass
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from function.func_response_cache import ResponseCache
+
+# AI 回复的 JSON 解析优先使用 orjson，未安装时退回标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+# 以下模块依赖第三方库，导入失败时对应命令降级为提示错误，不影响其他命令
+try:
+    from function.func_duel import get_rank_system
+except ImportError:
+    get_rank_system = None
+try:
+    from function.func_news import News
+except ImportError:
+    News = None
+try:
+    from function.func_weather import Weather
+except ImportError:
+    Weather = None
+try:
+    from function.func_insult import generate_random_insult
+except ImportError:
+    generate_random_insult = None
+try:
+    from ai_providers.ai_chatgpt import ChatGPT
+except ImportError:
+    ChatGPT = None
 
 # 前向引用避免循环导入
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .context import MessageContext
 
+# 分钟精度的时间字符串缓存，只在分钟变化时重新格式化
+_last_minute_ts = 0
+_last_minute_str = ""
+_minute_lock = threading.Lock()
+
+
+def current_hm() -> str:
+    """获取当前时间的 HH:MM 字符串（按分钟缓存）"""
+    global _last_minute_ts, _last_minute_str
+    now = int(time.time())
+    minute = now // 60
+    if minute != _last_minute_ts:
+        with _minute_lock:
+            if minute != _last_minute_ts:
+                _last_minute_str = time.strftime("%H:%M", time.localtime(now))
+                _last_minute_ts = minute
+    return _last_minute_str
+
+
+# 秒精度的完整日期时间字符串缓存，同一秒内的多次调用复用同一个结果
+_last_second_ts = 0
+_last_second_str = ""
+_second_lock = threading.Lock()
+
+
+def _current_datetime_str() -> str:
+    """获取当前时间的 YYYY-MM-DD HH:MM:SS 字符串（按秒缓存）"""
+    global _last_second_ts, _last_second_str
+    now = int(time.time())
+    if now != _last_second_ts:
+        with _second_lock:
+            if now != _last_second_ts:
+                _last_second_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+                _last_second_ts = now
+    return _last_second_str
+
+
+# 消息正文为空时发送给AI的占位文本
+_EMPTY_PLACEHOLDER = "[空内容]"
+
+
+def _format_ai_query(ctx: 'MessageContext', text: str) -> str:
+    """
+    将当前消息格式化为发送给AI的文本（带时间、发送者、引用消息等信息）
+    :param text: XML 处理器无结果时使用的消息正文
+    """
+    # 同一条消息在一次命令处理链中（如 Perplexity 回退到闲聊）只做一次 XML 解析和格式化
+    q_with_info = ctx._ai_query
+    if q_with_info is not None:
+        return q_with_info or f"[{current_hm()}] {ctx.sender_name}: {text if text else _EMPTY_PLACEHOLDER}"
+
+    raw_content = getattr(ctx.msg, 'content', '') or ''
+    if getattr(ctx.msg, 'type', None) == 0x01 and raw_content and not ('<' in raw_content and '>' in raw_content):
+        # 快速路径：不含XML的纯文本消息不可能带引用，XML处理器对其也只是原样返回内容
+        q_with_info = f"[{current_hm()}] {ctx.sender_name}: {raw_content}"
+    elif (xml_processor := getattr(ctx.robot, "xml_processor", None)) is not None:
+        # 创建格式化的聊天内容（带有引用消息等）
+        if ctx.is_group:
+            # 处理群聊消息
+            msg_data = xml_processor.extract_quoted_message(ctx.msg)
+        else:
+            # 处理私聊消息
+            msg_data = xml_processor.extract_private_quoted_message(ctx.msg)
+        q_with_info = xml_processor.format_message_for_ai(msg_data, ctx.sender_name)
+    # 空字符串表示已处理过但没有结果，下次直接走简单格式化
+    ctx._ai_query = q_with_info or ""
+    
+    if not q_with_info:
+        # 简单格式化
+        q_with_info = f"[{current_hm()}] {ctx.sender_name}: {text if text else _EMPTY_PLACEHOLDER}"
+    return q_with_info
+
+# 提醒解析需要调用AI（可能重试多次），放到后台线程执行，避免阻塞消息分发
+_reminder_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ReminderWorker")
+
+def shutdown_background_tasks(wait: bool = True) -> None:
+    """停止后台提醒解析线程池（机器人停止时调用，需在卸载AI模型、关闭微信客户端之前）"""
+    _reminder_executor.shutdown(wait=wait)
+
+# 引用图片的临时下载目录，首次使用时创建一次
+_IMAGE_CACHE_DIR = "temp/image_cache"
+_image_cache_dir_ready = False
+
+# 流式回复时，首句达到该长度且遇到句末标点就先行发送，其余内容生成完毕后再发送
+_FIRST_FLUSH_MIN_LEN = 20
+_SENTENCE_END_RE = re.compile(r'[。！？!?\n]')
+
+
+def _stream_answer(ctx: 'MessageContext', chat_model: Any, at_list: str, **kwargs) -> str:
+    """
+    流式调用AI并先行发送第一句，以掩盖完整生成的耗时
+    :return: 完整回复文本；为空表示AI没有返回内容（此时未发送任何消息）
+    """
+    buffer = ""
+    sent_len = 0
+    for delta in chat_model.get_answer_stream(**kwargs):
+        buffer += delta
+        if sent_len == 0:
+            end_match = _SENTENCE_END_RE.search(buffer, _FIRST_FLUSH_MIN_LEN - 1)
+            if end_match:
+                first_sentence = buffer[:end_match.end()].strip()
+                if first_sentence:
+                    ctx.send_text(first_sentence, at_list)
+                sent_len = end_match.end()
+    
+    rest = buffer[sent_len:].strip()
+    if rest:
+        # 首句已@过用户，剩余部分不再重复@
+        ctx.send_text(rest, at_list if sent_len == 0 else "")
+    return buffer
+
+# 闲聊回复缓存（按会话+发送者+内容精确匹配）
+_chitchat_cache = ResponseCache(max_size=512, ttl=600)
+
+def _is_stateless_call(chat_model: Any, specific_max_history: Optional[int]) -> bool:
+    """
+    本次调用是否不带对话历史。带历史时回复依赖上下文，而命中缓存不会经过模型，
+    这轮对话也不会进入模型看到的上下文，因此只有不带历史的调用才使用闲聊缓存
+    """
+    if getattr(chat_model, 'message_summary', None) is None or not getattr(chat_model, 'bot_wxid', None):
+        return True
+    limit = specific_max_history if specific_max_history is not None else getattr(chat_model, 'max_history_messages', None)
+    return limit == 0
+
+# JSON 起始括号 -> (对应的结束括号, 顶层类型)
+_JSON_BRACKETS = {'{': ('}', dict), '[': (']', list)}
+
+def _extract_json(text: str, expected: tuple = (dict, list)) -> Optional[str]:
+    """
+    从AI回复中提取第一个顶层 JSON 容器（对象或数组）片段（单次扫描，跳过字符串内的括号）
+    :param expected: 允许的顶层类型，dict 对应 {...}，list 对应 [...]
+    :return: JSON 字符串片段；找不到、括号未配平或顶层类型不符时返回 None
+    """
+    starts = [pos for pos in (text.find('{'), text.find('[')) if pos != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    if _JSON_BRACKETS[text[start]][1] not in expected:
+        return None
+    closers = [] # 尚未闭合的括号对应的结束括号
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _JSON_BRACKETS:
+            closers.append(_JSON_BRACKETS[ch][0])
+        elif ch == '}' or ch == ']':
+            if not closers or closers.pop() != ch:
+                return None # 括号不匹配
+            if not closers:
+                return text[start:i + 1]
+    return None # 括号未配平
+
+def group_only(msg: str):
+    """装饰器：私聊中调用时发送提示并直接返回 True，不进入处理函数"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(ctx: 'MessageContext', match: Optional[Match]) -> bool:
+            if not ctx.is_group:
+                ctx.send_text(msg)
+                return True
+            return fn(ctx, match)
+        return wrapper
+    return decorator
+
+# 命令缺少参数时的提示
+_ASK_EMPTY_MSG = "请在 'ask' 后面加上您想问的问题。"
+_REMINDER_EMPTY_MSG = "请告诉我需要提醒什么内容和时间呀~ (例如：提醒我明天下午3点开会)"
+_WEATHER_EMPTY_MSG = "🤔 请告诉我你想查询哪个城市的天气预报，例如：天气预报 北京"
+
+# 帮助信息，模块加载时拼接一次
+_HELP_TEXT = "\n".join([
+    "🤖 泡泡的指令列表 🤖",
+    "",
+    "【实用工具】",
+    "- 天气/温度 [城市名]",
+    "- 天气预报/预报 [城市名]",
+    "- 新闻",
+    "- ask [问题]",
+    "",
+    "【决斗 & 偷袭】",
+    "- 决斗@XX",
+    "- 偷袭@XX",
+    "- 决斗排行/排行榜",
+    "- 我的战绩/决斗战绩",
+    "- 我的装备/查看装备",
+    "- 改名 [旧名] [新名]",
+    "",
+    "【提醒】",
+    "- 提醒xxxxx：一次性、每日、每周",
+    "- 查看提醒/我的提醒/提醒列表",
+    "- 删..提醒..",
+    "",
+    "【群聊工具】",
+    "- summary/总结",
+    "- clearmessages/清除历史",
+    ""
+])
+
 def handle_help(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """
     处理 "帮助" 命令
     
     匹配: info/帮助/指令
     """
-    help_text = [
-        "🤖 泡泡的指令列表 🤖",
-        "",
-        "【实用工具】",
-        "- 天气/温度 [城市名]",
-        "- 天气预报/预报 [城市名]",
-        "- 新闻",
-        "- ask [问题]",
-        "",
-        "【决斗 & 偷袭】",
-        "- 决斗@XX",
-        "- 偷袭@XX",
-        "- 决斗排行/排行榜",
-        "- 我的战绩/决斗战绩",
-        "- 我的装备/查看装备",
-        "- 改名 [旧名] [新名]",
-        "",
-        "【提醒】",
-        "- 提醒xxxxx：一次性、每日、每周",
-        "- 查看提醒/我的提醒/提醒列表",
-        "- 删..提醒..",
-        "",
-        "【群聊工具】",
-        "- summary/总结",
-        "- clearmessages/清除历史",
-        ""
-    ]
-    help_text = "\n".join(help_text)
-    
-    # 发送消息
-    return ctx.send_text(help_text)
+    return ctx.send_text(_HELP_TEXT)
 
+@group_only("❌ 装备查看功能只支持群聊")
 def handle_check_equipment(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """
     处理 "查看装备" 命令
     
     匹配: 我的装备/查看装备
     """
-    if not ctx.is_group:
-        ctx.send_text("❌ 装备查看功能只支持群聊")
-        return True
-    
     try:
-        from function.func_duel import DuelRankSystem
-        
+        if get_rank_system is None:
+            raise ImportError("无法导入 func_duel 模块")
+
         player_name = ctx.sender_name
-        rank_system = DuelRankSystem(ctx.msg.roomid)
+        rank_system = get_rank_system(ctx.msg.roomid)
         player_data = rank_system.get_player_data(player_name)
         
         if not player_data:
@@ -83,27 +299,26 @@ def handle_check_equipment(ctx: 'MessageContext', match: Optional[Match]) -> boo
         return True
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"查看装备出错: {e}")
+            ctx.logger.error("查看装备出错: %s", e)
         ctx.send_text("⚠️ 查看装备失败")
         return False
 
+@group_only("⚠️ 消息总结功能仅支持群聊")
 def handle_summary(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """
     处理 "消息总结" 命令
     
     匹配: summary/总结
     """
-    if not ctx.is_group:
-        ctx.send_text("⚠️ 消息总结功能仅支持群聊")
-        return True
-    
     try:
         # 获取群聊ID
         chat_id = ctx.msg.roomid
         
         # 使用MessageSummary生成总结
-        if ctx.robot and hasattr(ctx.robot, "message_summary") and hasattr(ctx.robot, "chat"):
-            summary = ctx.robot.message_summary.summarize_messages(chat_id, ctx.robot.chat)
+        message_summary = getattr(ctx.robot, "message_summary", None)
+        if message_summary is not None:
+            # 没有AI模型时 summarize_messages 会退回基础总结
+            summary = message_summary.summarize_messages(chat_id, getattr(ctx.robot, "chat", None))
             
             # 发送总结
             ctx.send_text(summary)
@@ -114,27 +329,25 @@ def handle_summary(ctx: 'MessageContext', match: Optional[Match]) -> bool:
             return False
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"生成消息总结出错: {e}")
+            ctx.logger.error("生成消息总结出错: %s", e)
         ctx.send_text("⚠️ 生成消息总结失败")
         return False
 
+@group_only("⚠️ 消息历史管理功能仅支持群聊")
 def handle_clear_messages(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """
     处理 "清除消息历史" 命令
     
     匹配: clearmessages/清除消息/清除历史
     """
-    if not ctx.is_group:
-        ctx.send_text("⚠️ 消息历史管理功能仅支持群聊")
-        return True
-    
     try:
         # 获取群聊ID
         chat_id = ctx.msg.roomid
         
         # 清除历史
-        if ctx.robot and hasattr(ctx.robot, "message_summary"):
-            if ctx.robot.message_summary.clear_message_history(chat_id):
+        message_summary = getattr(ctx.robot, "message_summary", None)
+        if message_summary is not None:
+            if message_summary.clear_message_history(chat_id):
                 ctx.send_text("✅ 已清除本群的消息历史记录")
             else:
                 ctx.send_text("⚠️ 本群没有消息历史记录")
@@ -145,7 +358,7 @@ def handle_clear_messages(ctx: 'MessageContext', match: Optional[Match]) -> bool
             return False
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"清除消息历史出错: {e}")
+            ctx.logger.error("清除消息历史出错: %s", e)
         ctx.send_text("⚠️ 清除消息历史失败")
         return False
 
@@ -156,16 +369,17 @@ def handle_news_request(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     匹配: 新闻
     """
     if ctx.logger:
-        ctx.logger.info(f"收到来自 {ctx.sender_name} (群聊: {ctx.msg.roomid if ctx.is_group else '无'}) 的新闻请求")
+        ctx.logger.info("收到来自 %s (群聊: %s) 的新闻请求", ctx.sender_name, ctx.msg.roomid if ctx.is_group else '无')
         
     try:
-        from function.func_news import News
+        if News is None:
+            raise ImportError("无法导入 func_news 模块")
         news_instance = News()
         # 调用方法，接收返回的元组(is_today, news_content)
         is_today, news_content = news_instance.get_important_news()
 
         receiver = ctx.get_receiver()
-        sender_for_at = ctx.msg.sender if ctx.is_group else "" # 群聊中@请求者
+        sender_for_at = ctx.at_list # 群聊中@请求者
 
         if is_today:
             # 是当天新闻，直接发送
@@ -183,9 +397,9 @@ def handle_news_request(ctx: 'MessageContext', match: Optional[Match]) -> bool:
         return True # 无论结果如何，命令本身算成功处理
 
     except Exception as e:
-        if ctx.logger: ctx.logger.error(f"处理新闻请求时出错: {e}")
+        if ctx.logger: ctx.logger.error("处理新闻请求时出错: %s", e)
         receiver = ctx.get_receiver()
-        sender_for_at = ctx.msg.sender if ctx.is_group else ""
+        sender_for_at = ctx.at_list
         ctx.send_text("❌ 获取新闻时发生错误，请稍后重试。", sender_for_at)
         return False # 处理失败
 
@@ -194,11 +408,7 @@ def handle_chitchat(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     处理闲聊，调用AI模型生成回复
     """
     # 获取对应的AI模型
-    chat_model = None
-    if hasattr(ctx, 'chat'):
-        chat_model = ctx.chat
-    elif ctx.robot and hasattr(ctx.robot, 'chat'):
-        chat_model = ctx.robot.chat
+    chat_model = ctx.chat
     
     if not chat_model:
         if ctx.logger:
@@ -209,51 +419,52 @@ def handle_chitchat(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     # 获取特定的历史消息数量限制
     specific_max_history = getattr(ctx, 'specific_max_history', None)
     if ctx.logger and specific_max_history is not None:
-        ctx.logger.debug(f"为 {ctx.get_receiver()} 使用特定历史限制: {specific_max_history}")
+        ctx.logger.debug("为 %s 使用特定历史限制: %s", ctx.get_receiver(), specific_max_history)
     
     #  处理引用图片情况
     if getattr(ctx, 'is_quoted_image', False):
         ctx.logger.info("检测到引用图片消息，尝试处理图片内容...")
         
-        import os
-        from ai_providers.ai_chatgpt import ChatGPT
-        
-        # 确保是 ChatGPT 类型且支持图片处理
-        support_vision = False
-        if isinstance(chat_model, ChatGPT):
-            if hasattr(chat_model, 'support_vision') and chat_model.support_vision:
-                support_vision = True
-            else:
-                # 检查模型名称判断是否支持视觉
-                if hasattr(chat_model, 'model'):
-                    model_name = getattr(chat_model, 'model', '')
-                    support_vision = model_name == "gpt-4.1-mini" or model_name == "gpt-4o" or "-vision" in model_name
-        
-        if not support_vision:
+        # 确保是 ChatGPT 类型且支持图片处理（support_vision 在模型初始化时已确定）
+        if not (ChatGPT is not None and isinstance(chat_model, ChatGPT) and chat_model.support_vision):
             ctx.send_text("抱歉，当前 AI 模型不支持处理图片。请联系管理员配置支持视觉的模型 (如 gpt-4-vision-preview、gpt-4o 等)。")
             return True
         
         # 下载图片并处理
         try:
-            # 创建临时目录
-            temp_dir = "temp/image_cache"
-            os.makedirs(temp_dir, exist_ok=True)
+            # 临时目录只需创建一次
+            global _image_cache_dir_ready
+            if not _image_cache_dir_ready:
+                os.makedirs(_IMAGE_CACHE_DIR, exist_ok=True)
+                _image_cache_dir_ready = True
             
             # 下载图片
-            ctx.logger.info(f"正在下载引用图片: msg_id={ctx.quoted_msg_id}")
+            ctx.logger.info("正在下载引用图片: msg_id=%s", ctx.quoted_msg_id)
             image_path = ctx.wcf.download_image(
                 id=ctx.quoted_msg_id,
                 extra=ctx.quoted_image_extra,
-                dir=temp_dir,
+                dir=_IMAGE_CACHE_DIR,
                 timeout=30
             )
             
-            if not image_path or not os.path.exists(image_path):
-                ctx.logger.error(f"图片下载失败: {image_path}")
+            # 读入内存后立即删除临时文件，分析时直接使用图片数据
+            try:
+                with open(image_path, "rb") as f:
+                    image_data = f.read()
+            except (OSError, TypeError) as e:
+                ctx.logger.error("图片下载失败: %s (%s)", image_path, e)
                 ctx.send_text("抱歉，无法下载图片进行分析。")
                 return True
+            finally:
+                try:
+                    if image_path:
+                        os.remove(image_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    ctx.logger.error("删除临时图片出错: %s", e)
             
-            ctx.logger.info(f"图片下载成功: {image_path}，准备分析...")
+            ctx.logger.info("图片下载成功: %s，准备分析...", image_path)
             
             # 调用 ChatGPT 分析图片
             try:
@@ -263,26 +474,18 @@ def handle_chitchat(ctx: 'MessageContext', match: Optional[Match]) -> bool:
                     prompt = "请详细描述这张图片中的内容"
                 
                 # 调用图片分析函数
-                response = chat_model.get_image_description(image_path, prompt)
+                response = chat_model.get_image_description(image_data, prompt)
                 ctx.send_text(response)
                 
                 ctx.logger.info("图片分析完成并已发送回复")
             except Exception as e:
-                ctx.logger.error(f"分析图片时出错: {e}")
+                ctx.logger.error("分析图片时出错: %s", e)
                 ctx.send_text(f"分析图片时出错: {str(e)}")
             
-            # 清理临时图片
-            try:
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    ctx.logger.info(f"临时图片已删除: {image_path}")
-            except Exception as e:
-                ctx.logger.error(f"删除临时图片出错: {e}")
-            
             return True  # 已处理，不执行后续的普通文本处理流程
             
         except Exception as e:
-            ctx.logger.error(f"处理引用图片过程中出错: {e}")
+            ctx.logger.error("处理引用图片过程中出错: %s", e)
             ctx.send_text(f"处理图片时发生错误: {str(e)}")
             return True  # 已处理，即使出错也不执行后续普通文本处理
     
@@ -290,44 +493,54 @@ def handle_chitchat(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     content = ctx.text
     sender_name = ctx.sender_name
     
-    # 使用XML处理器格式化消息
-    if ctx.robot and hasattr(ctx.robot, "xml_processor"):
-        # 创建格式化的聊天内容（带有引用消息等）
-        if ctx.is_group:
-            # 处理群聊消息
-            msg_data = ctx.robot.xml_processor.extract_quoted_message(ctx.msg)
-            q_with_info = ctx.robot.xml_processor.format_message_for_ai(msg_data, sender_name)
-        else:
-            # 处理私聊消息
-            msg_data = ctx.robot.xml_processor.extract_private_quoted_message(ctx.msg)
-            q_with_info = ctx.robot.xml_processor.format_message_for_ai(msg_data, sender_name)
-        
-        if not q_with_info:
-            import time
-            current_time = time.strftime("%H:%M", time.localtime())
-            q_with_info = f"[{current_time}] {sender_name}: {content or '[空内容]'}"
-    else:
-        # 简单格式化
-        import time
-        current_time = time.strftime("%H:%M", time.localtime())
-        q_with_info = f"[{current_time}] {sender_name}: {content or '[空内容]'}"
+    # 仅对不带历史的纯文本消息使用回复缓存，引用/卡片等消息的上下文不同
+    receiver = ctx.get_receiver()
+    cacheable = (bool(content) and getattr(ctx.msg, 'type', None) == 1
+                 and _is_stateless_call(chat_model, specific_max_history))
+    if cacheable:
+        cached_rsp = _chitchat_cache.get(receiver, sender_name, content)
+        if cached_rsp:
+            if ctx.logger:
+                ctx.logger.info("【闲聊缓存】命中缓存，直接返回回复")
+            at_list = ctx.at_list
+            ctx.send_text(cached_rsp, at_list)
+            return True
+    
+    # 格式化消息（带引用消息等）
+    q_with_info = _format_ai_query(ctx, content)
     
     # 获取AI回复
     try:
         if ctx.logger:
-            ctx.logger.info(f"【发送内容】将以下消息发送给AI: \n{q_with_info}")
+            ctx.logger.info("【发送内容】将以下消息发送给AI: \n%s", q_with_info)
         
-        # 调用AI模型，传递特定历史限制
-        rsp = chat_model.get_answer(
-            question=q_with_info, 
-            wxid=ctx.get_receiver(),
-            specific_max_history=specific_max_history
-        )
+        at_list = ctx.at_list
+        streamed = hasattr(chat_model, 'get_answer_stream')
+        if streamed:
+            # 支持流式输出的模型：边生成边发送，首句先行返回
+            rsp = _stream_answer(
+                ctx, chat_model, at_list,
+                question=q_with_info,
+                wxid=receiver,
+                specific_max_history=specific_max_history
+            ).strip()
+        else:
+            # 调用AI模型，传递特定历史限制
+            rsp = chat_model.get_answer(
+                question=q_with_info, 
+                wxid=receiver,
+                specific_max_history=specific_max_history
+            )
         
         if rsp:
-            # 发送回复
-            at_list = ctx.msg.sender if ctx.is_group else ""
-            ctx.send_text(rsp, at_list)
+            # 只缓存模型确认成功的回复；错误提示或中途失败的残缺回复不缓存
+            last_call_ok = getattr(chat_model, 'last_call_ok', None)
+            if cacheable and last_call_ok is not None and last_call_ok():
+                _chitchat_cache.set(receiver, sender_name, content, rsp)
+            
+            # 发送回复（流式模式下已在生成过程中发送）
+            if not streamed:
+                ctx.send_text(rsp, at_list)
             
             return True
         else:
@@ -336,19 +549,16 @@ def handle_chitchat(ctx: 'MessageContext', match: Optional[Match]) -> bool:
             return False
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"获取AI回复时出错: {e}")
+            ctx.logger.error("获取AI回复时出错: %s", e)
         return False
 
+@group_only("❌ 骂人功能只支持群聊哦~")
 def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """
     处理 "骂人" 命令
     
     匹配: 骂一下@XX
     """
-    if not ctx.is_group:
-        ctx.send_text("❌ 骂人功能只支持群聊哦~")
-        return True
-    
     if not match:
         return False
     
@@ -356,7 +566,7 @@ def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     target_mention_name = match.group(1).strip()
     
     if ctx.logger:
-        ctx.logger.info(f"群聊 {ctx.msg.roomid} 中检测到骂人指令，提及目标：{target_mention_name}")
+        ctx.logger.info("群聊 %s 中检测到骂人指令，提及目标：%s", ctx.msg.roomid, target_mention_name)
     
     # 默认使用提及的名称
     actual_target_name = target_mention_name  
@@ -364,15 +574,9 @@ def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     
     # 尝试查找实际群成员昵称和wxid
     try:
-        found = False
-        for wxid, name in ctx.room_members.items():
-            # 优先完全匹配，其次部分匹配
-            if target_mention_name == name:
-                target_wxid = wxid
-                actual_target_name = name
-                found = True
-                break
-        if not found:  # 如果完全匹配不到，再尝试部分匹配
+        # 优先完全匹配（哈希查找），其次部分匹配
+        target_wxid = ctx.name_to_wxid.get(target_mention_name)
+        if target_wxid is None:  # 如果完全匹配不到，再尝试部分匹配
             for wxid, name in ctx.room_members.items():
                 if target_mention_name in name:
                     target_wxid = wxid
@@ -380,7 +584,7 @@ def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
                     break
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"查找群成员信息时出错: {e}")
+            ctx.logger.error("查找群成员信息时出错: %s", e)
         # 出错时继续使用提及的名称
     
     # 禁止骂机器人自己
@@ -390,12 +594,13 @@ def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     
     # 即使找不到wxid，仍然尝试使用提及的名字骂
     try:
-        from function.func_insult import generate_random_insult
+        if generate_random_insult is None:
+            raise ImportError("无法导入 func_insult 模块")
         insult_text = generate_random_insult(actual_target_name)
         ctx.send_text(insult_text)
         
         if ctx.logger:
-            ctx.logger.info(f"已发送骂人消息至群 {ctx.msg.roomid}，目标: {actual_target_name}")
+            ctx.logger.info("已发送骂人消息至群 %s，目标: %s", ctx.msg.roomid, actual_target_name)
         
         return True
     except ImportError:
@@ -405,7 +610,7 @@ def handle_insult(ctx: 'MessageContext', match: Optional[Match]) -> bool:
         return True
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"生成或发送骂人消息时出错: {e}")
+            ctx.logger.error("生成或发送骂人消息时出错: %s", e)
         ctx.send_text("呃，我想骂但出错了...")
         return True
 
@@ -431,12 +636,12 @@ def handle_perplexity_ask(ctx: 'MessageContext', match: Optional[Match]) -> bool
     # 3. 从匹配结果中提取问题内容
     prompt = match.group(1).strip()
     if not prompt:  # 如果 'ask' 后面没有内容
-        ctx.send_text("请在 'ask' 后面加上您想问的问题。", ctx.msg.sender if ctx.is_group else None)
+        ctx.send_text(_ASK_EMPTY_MSG, ctx.at_list)
         return True  # 命令已被处理
 
     # 4. 准备调用 Perplexity 实例的 process_message 方法
     if ctx.logger:
-        ctx.logger.info(f"检测到 Perplexity 请求，发送者: {ctx.sender_name}, 问题: {prompt[:50]}...")
+        ctx.logger.info("检测到 Perplexity 请求，发送者: %s, 问题: %s...", ctx.sender_name, prompt[:50])
 
     # 准备参数并调用 process_message
     # 确保无论用户输入有没有空格，都以标准格式"ask 问题"传给process_message
@@ -459,38 +664,19 @@ def handle_perplexity_ask(ctx: 'MessageContext', match: Optional[Match]) -> bool
     # 6. 如果没有被处理且有备选prompt，使用默认AI处理
     if not was_handled and fallback_prompt:
         if ctx.logger:
-            ctx.logger.info(f"使用备选prompt '{fallback_prompt[:20]}...' 调用默认AI处理")
+            ctx.logger.info("使用备选prompt '%s...' 调用默认AI处理", fallback_prompt[:20])
         
         # 获取当前选定的AI模型
-        chat_model = None
-        if hasattr(ctx, 'chat'):
-            chat_model = ctx.chat
-        elif ctx.robot and hasattr(ctx.robot, 'chat'):
-            chat_model = ctx.robot.chat
+        chat_model = ctx.chat
         
         if chat_model:
             # 使用与 handle_chitchat 类似的逻辑，但使用备选prompt
             try:
                 # 格式化消息，与 handle_chitchat 保持一致
-                if ctx.robot and hasattr(ctx.robot, "xml_processor"):
-                    if ctx.is_group:
-                        msg_data = ctx.robot.xml_processor.extract_quoted_message(ctx.msg)
-                        q_with_info = ctx.robot.xml_processor.format_message_for_ai(msg_data, ctx.sender_name)
-                    else:
-                        msg_data = ctx.robot.xml_processor.extract_private_quoted_message(ctx.msg)
-                        q_with_info = ctx.robot.xml_processor.format_message_for_ai(msg_data, ctx.sender_name)
-                    
-                    if not q_with_info:
-                        import time
-                        current_time = time.strftime("%H:%M", time.localtime())
-                        q_with_info = f"[{current_time}] {ctx.sender_name}: {prompt or '[空内容]'}"
-                else:
-                    import time
-                    current_time = time.strftime("%H:%M", time.localtime())
-                    q_with_info = f"[{current_time}] {ctx.sender_name}: {prompt or '[空内容]'}"
+                q_with_info = _format_ai_query(ctx, prompt)
                 
                 if ctx.logger:
-                    ctx.logger.info(f"发送给默认AI的消息内容: {q_with_info}")
+                    ctx.logger.info("发送给默认AI的消息内容: %s", q_with_info)
                 
                 # 调用 AI 模型时传入备选 prompt
                 # 需要调整 get_answer 方法以支持 system_prompt_override 参数
@@ -505,7 +691,7 @@ def handle_perplexity_ask(ctx: 'MessageContext', match: Optional[Match]) -> bool
                 
                 if rsp:
                     # 发送回复
-                    at_list = ctx.msg.sender if ctx.is_group else ""
+                    at_list = ctx.at_list
                     ctx.send_text(rsp, at_list)
                     
                     return True
@@ -514,31 +700,21 @@ def handle_perplexity_ask(ctx: 'MessageContext', match: Optional[Match]) -> bool
                         ctx.logger.error("无法从默认AI获得答案")
             except Exception as e:
                 if ctx.logger:
-                    ctx.logger.error(f"使用备选prompt调用默认AI时出错: {e}")
+                    ctx.logger.error("使用备选prompt调用默认AI时出错: %s", e)
     
     return was_handled 
 
-def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
-    """处理来自私聊或群聊的 '提醒' 命令，支持批量添加多个提醒"""
-    # 2. 获取用户输入的提醒内容 (现在从完整消息获取)
-    raw_text = ctx.msg.content.strip() # 修改：从 ctx.msg.content 获取
-    if not raw_text: # 修改：仅检查是否为空
-        # 在群聊中@用户回复
-        at_list = ctx.msg.sender if ctx.is_group else ""
-        ctx.send_text("请告诉我需要提醒什么内容和时间呀~ (例如：提醒我明天下午3点开会)", at_list) 
-        return True
-
-    # 3. 构造给 AI 的 Prompt，更新为支持批量提醒
-    sys_prompt = """
+# 提醒解析的系统提示词，支持批量提醒。内容完全静态，当前时间放在用户消息里
+_REMINDER_SYS_PROMPT = """
 你是提醒解析助手。请仔细分析用户输入的提醒信息，**识别其中可能包含的所有独立提醒请求**。将所有成功解析的提醒严格按照以下 JSON **数组** 格式输出结果，数组中的每个元素代表一个独立的提醒:
 [
-  {{
+  {
     "type": "once" | "daily" | "weekly",                 // 提醒类型: "once" (一次性) 或 "daily" (每日重复) 或 "weekly" (每周重复)
     "time": "YYYY-MM-DD HH:MM" | "HH:MM",     // "once"类型必须是 'YYYY-MM-DD HH:MM' 格式, "daily"与"weekly"类型必须是 'HH:MM' 格式。时间必须是未来的。
     "content": "提醒的具体内容文本",
     "weekday": 0-6,                           // 仅当 type="weekly" 时需要，周一=0, 周二=1, ..., 周日=6
-    "extra": {{}}                              // 保留字段，目前为空对象即可
-  }},
+    "extra": {}                              // 保留字段，目前为空对象即可
+  },
   // ... 可能有更多提醒对象 ...
 ]
 
@@ -553,24 +729,133 @@ def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
 - **如果无法识别出任何有效提醒，返回空数组 `[]`。**
 - 如果用户输入的某个提醒部分信息不完整或格式错误，请尝试解析其他部分，并在最终数组中仅包含解析成功的提醒。
 - 输出结果必须是纯 JSON 数组，不包含任何其他说明文字。
-
-当前准确时间是：{current_datetime}
 """
-    current_dt_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_prompt = sys_prompt.format(current_datetime=current_dt_str)
+
+# 提醒解析的用户消息模板：当前时间 + 用户原文
+_REMINDER_USER_MSG = "当前准确时间是：{current_datetime}\n请解析以下用户提醒，识别所有独立的提醒请求:\n{raw_text}"
+_REMINDER_RETRY_USER_MSG = "当前准确时间是：{current_datetime}\n请再次解析以下提醒，并返回严格的JSON数组格式(第{attempt}次尝试):\n{raw_text}"
+
+# 提醒解析最多尝试次数，以及每次重试时追加在用户消息末尾的提示（按尝试序号索引）
+_REMINDER_MAX_RETRIES = 3
+_REMINDER_RETRY_SUFFIXES = tuple(
+    f"\n\n**重要提示:** 这是第{attempt+1}次尝试。你之前的回复格式有误，无法被解析为有效的JSON。请确保你的回复仅包含有效的JSON数组，没有其他任何文字。"
+    for attempt in range(_REMINDER_MAX_RETRIES)
+)
+
+# 提醒时间格式：一次性 'YYYY-MM-DD HH:MM'，每日/每周 'HH:MM'（与 strptime 一样允许月日时分为一位数）
+_ONCE_TIME_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2})$")
+_HM_TIME_RE = re.compile(r"^(\d{1,2}):(\d{1,2})$")
+
+def _parse_once_time(time_str) -> Optional[datetime]:
+    """解析一次性提醒时间，格式或取值非法时返回 None（先用正则预校验，格式错误不必走异常）"""
+    m = _ONCE_TIME_RE.match(time_str) if isinstance(time_str, str) else None
+    if m is None:
+        return None
+    try:
+        return datetime(*map(int, m.groups()))
+    except ValueError: # 格式正确但日期不存在，如 2月30日
+        return None
+
+def _is_valid_hm_time(time_str) -> bool:
+    """校验每日/每周提醒的 HH:MM 时间"""
+    m = _HM_TIME_RE.match(time_str) if isinstance(time_str, str) else None
+    return m is not None and int(m.group(1)) <= 23 and int(m.group(2)) <= 59
+
+# 提醒回复中用到的星期与类型显示文本
+_WEEKDAYS = ("周一", "周二", "周三", "周四", "周五", "周六", "周日")
+_TYPE_STR_MAP = {"once": "一次性", "daily": "每日", "weekly": "每周"}
+
+# 设置提醒后的回复模板（单个提醒 / 多个提醒中的一项）
+_REPLY_SUCC_SINGLE = "✅ 已为您设置{type_str}提醒:\n时间: {time_display}\n内容: {content}"
+_REPLY_SUCC_MULTI = "✅ {label}: {type_str}\n {time_display} - \"{content_preview}\""
+_REPLY_FAIL_SINGLE = "❌ 设置提醒失败: {error}"
+_REPLY_FAIL_MULTI = "❌ {label}: \"{content_preview}\" - {error}"
+
+@dataclass(frozen=True)
+class _ReminderJob:
+    """后台解析提醒所需数据的快照；不持有 MessageContext，调用方之后修改消息也不影响后台任务"""
+    raw_text: str
+    sender: str
+    roomid: Optional[str]
+    receiver: str
+    at_list: str
+    chat: Any
+    reminder_manager: Any
+    robot: Any
+    logger: Any
+
+    def send_text(self, content: str) -> bool:
+        """回复发起提醒的会话（与 MessageContext.send_text 行为一致）"""
+        try:
+            self.robot.sendTextMsg(content, self.receiver, self.at_list)
+            return True
+        except Exception as e:
+            if self.logger:
+                self.logger.error("发送消息失败: %s", e)
+            return False
+
+def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
+    """处理来自私聊或群聊的 '提醒' 命令，支持批量添加多个提醒"""
+    # 2. 获取用户输入的提醒内容 (现在从完整消息获取)
+    raw_text = ctx.msg.content.strip() # 修改：从 ctx.msg.content 获取
+    at_list = ctx.at_list
+    if not raw_text: # 修改：仅检查是否为空
+        # 在群聊中@用户回复
+        ctx.send_text(_REMINDER_EMPTY_MSG, at_list)
+        return True
+
+    # 依赖项在回复"正在解析"之前同步检查，避免先提示处理中再报错
+    if not ctx.chat:
+        ctx.send_text("❌ 当前没有可用的AI模型，无法解析提醒。", at_list)
+        return True
+    # 检查 ReminderManager 是否存在（未启用时属性可能缺失或为 None）
+    reminder_manager = getattr(ctx.robot, 'reminder_manager', None)
+    if reminder_manager is None:
+        ctx.send_text("❌ 内部错误：提醒管理器未初始化。", at_list)
+        if ctx.logger: ctx.logger.error("handle_reminder 无法访问 ctx.robot.reminder_manager")
+        return True
+
+    job = _ReminderJob(
+        raw_text=raw_text,
+        sender=ctx.msg.sender,
+        roomid=ctx.msg.roomid if ctx.is_group else None,
+        receiver=ctx.get_receiver(),
+        at_list=at_list,
+        chat=ctx.chat,
+        reminder_manager=reminder_manager,
+        robot=ctx.robot,
+        logger=ctx.logger,
+    )
+
+    # 先告知用户正在处理，AI解析和写库在后台完成后再回复结果
+    ctx.send_text("⏳ 正在解析提醒...", at_list)
+    try:
+        _reminder_executor.submit(_parse_and_save_reminders, job)
+    except RuntimeError:
+        # 机器人正在停止，后台线程池已关闭
+        ctx.send_text("❌ 机器人正在停止，暂时无法设置提醒。", at_list)
+    return True
+
+def _parse_and_save_reminders(job: _ReminderJob) -> bool:
+    """后台任务：调用AI解析提醒内容、批量写入数据库并回复结果"""
+    # 后续多次用到的属性先绑定为局部变量
+    raw_text = job.raw_text
+    sender = job.sender
+    roomid = job.roomid
+    chat = job.chat
+    reminder_manager = job.reminder_manager
+    logger = job.logger
+
+    # 3. 系统提示词为静态常量，当前时间随用户消息一起发送
+    current_dt_str = _current_datetime_str()
+    formatted_prompt = _REMINDER_SYS_PROMPT
 
     # 4. 调用AI模型并解析
-    q_for_ai = f"请解析以下用户提醒，识别所有独立的提醒请求:\n{raw_text}"
+    q_for_ai = _REMINDER_USER_MSG.format(current_datetime=current_dt_str, raw_text=raw_text)
     try:
-        # 检查AI模型
-        if not hasattr(ctx, 'chat') or not ctx.chat:
-            raise ValueError("当前上下文中没有可用的AI模型")
-            
         # 获取AI回答
-        at_list = ctx.msg.sender if ctx.is_group else ""
-        
         # 实现最多尝试3次解析AI回复的逻辑
-        max_retries = 3
+        max_retries = _REMINDER_MAX_RETRIES
         retry_count = 0
         parsed_reminders = [] # 初始化为空列表
         ai_parsing_success = False
@@ -578,29 +863,20 @@ def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
         while retry_count < max_retries and not ai_parsing_success:
             # 如果是重试，更新提示信息
             if retry_count > 0:
-                enhanced_prompt = sys_prompt + f"\n\n**重要提示:** 这是第{retry_count+1}次尝试。你之前的回复格式有误，无法被解析为有效的JSON。请确保你的回复仅包含有效的JSON数组，没有其他任何文字。"
-                formatted_prompt = enhanced_prompt.format(current_datetime=current_dt_str)
-                # 在重试时提供更明确的信息
-                retry_q = f"请再次解析以下提醒，并返回严格的JSON数组格式(第{retry_count+1}次尝试):\n{raw_text}"
-                q_for_ai = retry_q
-            
-            ai_response = ctx.chat.get_answer(q_for_ai, ctx.get_receiver(), system_prompt_override=formatted_prompt)
+                # 系统提示词保持不变（利于命中前缀缓存），重试提示只追加在用户消息中
+                retry_q = _REMINDER_RETRY_USER_MSG.format(
+                    current_datetime=current_dt_str, attempt=retry_count + 1, raw_text=raw_text
+                )
+                q_for_ai = retry_q + _REMINDER_RETRY_SUFFIXES[retry_count]
             
-            # 尝试匹配 [...] 或 {...} (兼容单个提醒的情况，但优先列表)
-            json_match_list = re.search(r'\[.*\]', ai_response, re.DOTALL)
-            json_match_obj = re.search(r'\{.*\}', ai_response, re.DOTALL)
+            ai_response = chat.get_answer(q_for_ai, job.receiver, system_prompt_override=formatted_prompt)
             
-            json_str = None
-            if json_match_list:
-                json_str = json_match_list.group(0)
-            elif json_match_obj: # 如果没找到列表，尝试找单个对象 (增加兼容性)
-                 json_str = f"[{json_match_obj.group(0)}]" # 将单个对象包装成数组
-            else:
-                json_str = ai_response # 如果都找不到，直接尝试解析原始回复
+            # 提取回复中第一个顶层的 [...] 或 {...}（单个对象视为只有一个提醒），找不到时直接尝试解析原始回复
+            json_str = _extract_json(ai_response, (list, dict)) or ai_response
             
             try:
                 # 尝试解析JSON
-                parsed_data = json.loads(json_str)
+                parsed_data = _json_loads(json_str)
                 # 确保解析结果是一个列表
                 if isinstance(parsed_data, dict):
                     parsed_reminders = [parsed_data] # 包装成单元素列表
@@ -616,31 +892,25 @@ def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
             except (json.JSONDecodeError, ValueError) as e:
                 # JSON解析失败
                 retry_count += 1
-                if ctx.logger: 
-                    ctx.logger.warning(f"AI 返回 JSON 解析失败(第{retry_count}次尝试): {ai_response}, 错误: {str(e)}")
+                if logger: 
+                    logger.warning("AI 返回 JSON 解析失败(第%s次尝试): %s, 错误: %s", retry_count, ai_response, str(e))
                 
                 if retry_count >= max_retries:
                     # 达到最大重试次数，返回错误
-                    ctx.send_text(f"❌ 抱歉，无法理解您的提醒请求。请尝试换一种方式表达，或分开设置多个提醒。", at_list)
-                    if ctx.logger: ctx.logger.error(f"解析AI回复失败，已达到最大重试次数({max_retries}): {ai_response}")
+                    job.send_text(f"❌ 抱歉，无法理解您的提醒请求。请尝试换一种方式表达，或分开设置多个提醒。")
+                    if logger: logger.error("解析AI回复失败，已达到最大重试次数(%s): %s", max_retries, ai_response)
                     return True
                 # 否则继续下一次循环重试
         
-        # 检查 ReminderManager 是否存在
-        if not hasattr(ctx.robot, 'reminder_manager'):
-            ctx.send_text("❌ 内部错误：提醒管理器未初始化。", at_list)
-            if ctx.logger: ctx.logger.error("handle_reminder 无法访问 ctx.robot.reminder_manager")
-            return True
-
         # 如果AI返回空列表，告知用户
         if not parsed_reminders:
-            ctx.send_text("🤔 嗯... 我好像没太明白您想设置什么提醒，可以换种方式再说一次吗？", at_list)
+            job.send_text("🤔 嗯... 我好像没太明白您想设置什么提醒，可以换种方式再说一次吗？")
             return True
 
         # 批量处理提醒 
         results = [] # 用于存储每个提醒的处理结果
-        roomid = ctx.msg.roomid if ctx.is_group else None
 
+        pending = [] # 校验通过、待批量写入的提醒 (结果下标, 标签, 数据)
         for index, data in enumerate(parsed_reminders):
             reminder_label = f"提醒{index+1}" # 给每个提醒一个标签，方便反馈
             validation_error = None # 存储验证错误信息
@@ -654,43 +924,51 @@ def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
                 validation_error = "提醒内容太短"
             else:
                 # 验证时间格式
-                try:
-                    if data["type"] == "once":
-                        dt = datetime.strptime(data["time"], "%Y-%m-%d %H:%M")
-                        if dt < datetime.now():
-                             validation_error = f"时间 ({data['time']}) 必须是未来的时间"
-                    elif data["type"] in ["daily", "weekly"]:
-                         datetime.strptime(data["time"], "%H:%M") # 仅校验格式
-                    else:
-                         validation_error = f"不支持的提醒类型: {data.get('type')}"
-                except ValueError:
-                     validation_error = f"时间格式错误 ({data.get('time', '')})"
+                if data["type"] == "once":
+                    dt = _parse_once_time(data["time"])
+                    if dt is None:
+                        validation_error = f"时间格式错误 ({data.get('time', '')})"
+                    elif dt < datetime.now():
+                        validation_error = f"时间 ({data['time']}) 必须是未来的时间"
+                elif data["type"] in ["daily", "weekly"]:
+                    if not _is_valid_hm_time(data["time"]): # 仅校验格式
+                        validation_error = f"时间格式错误 ({data.get('time', '')})"
+                else:
+                    validation_error = f"不支持的提醒类型: {data.get('type')}"
 
                 # 验证周提醒 (如果类型是 weekly 且无验证错误)
                 if not validation_error and data["type"] == "weekly":
                     if not (isinstance(data.get("weekday"), int) and 0 <= data.get("weekday") <= 6):
                         validation_error = "每周提醒需要指定周几(0-6)"
 
-            # 如果验证通过，尝试添加到数据库
             if not validation_error:
-                try:
-                    success, result_or_id = ctx.robot.reminder_manager.add_reminder(ctx.msg.sender, data, roomid=roomid)
-                    if success:
-                        results.append({"label": reminder_label, "success": True, "id": result_or_id, "data": data})
-                        if ctx.logger: ctx.logger.info(f"成功添加提醒 {result_or_id} for {ctx.msg.sender} (来自批量处理)")
-                    else:
-                        # add_reminder 返回错误信息
-                        results.append({"label": reminder_label, "success": False, "error": result_or_id, "data": data})
-                        if ctx.logger: ctx.logger.warning(f"添加提醒失败 (来自批量处理): {result_or_id}")
-                except Exception as db_e:
-                    # 捕获 add_reminder 可能抛出的其他异常
-                    error_msg = f"数据库错误: {db_e}"
-                    results.append({"label": reminder_label, "success": False, "error": error_msg, "data": data})
-                    if ctx.logger: ctx.logger.error(f"添加提醒时数据库出错 (来自批量处理): {db_e}", exc_info=True)
+                # 验证通过，先占位，稍后批量写入数据库
+                results.append(None)
+                pending.append((len(results) - 1, reminder_label, data))
             else:
                 # 验证失败
                 results.append({"label": reminder_label, "success": False, "error": validation_error, "data": data})
-                if ctx.logger: ctx.logger.warning(f"提醒数据验证失败 ({reminder_label}): {validation_error} - Data: {data}")
+                if logger: logger.warning("提醒数据验证失败 (%s): %s - Data: %s", reminder_label, validation_error, data)
+
+        # 所有验证通过的提醒在一个事务中写入数据库
+        if pending:
+            try:
+                batch_results = reminder_manager.add_reminders_batch(
+                    sender, [data for _, _, data in pending], roomid=roomid
+                )
+            except Exception as db_e:
+                # 捕获 add_reminders_batch 可能抛出的其他异常
+                batch_results = [(False, f"数据库错误: {db_e}")] * len(pending)
+                if logger: logger.error("批量添加提醒时数据库出错: %s", db_e, exc_info=True)
+
+            for (result_index, reminder_label, data), (success, result_or_id) in zip(pending, batch_results):
+                if success:
+                    results[result_index] = {"label": reminder_label, "success": True, "id": result_or_id, "data": data}
+                    if logger: logger.info("成功添加提醒 %s for %s (来自批量处理)", result_or_id, sender)
+                else:
+                    # add_reminders_batch 返回错误信息
+                    results[result_index] = {"label": reminder_label, "success": False, "error": result_or_id, "data": data}
+                    if logger: logger.warning("添加提醒失败 (来自批量处理): %s", result_or_id)
 
         # 构建汇总反馈消息 
         reply_parts = []
@@ -707,144 +985,136 @@ def handle_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
                 reply_parts.append(f"❌ 抱歉，所有 {len(results)} 个提醒设置均失败：\n")
                 
         # 添加每个提醒的详细信息
+        single = len(results) == 1
         for res in results:
-            content_preview = res['data'].get('content', '未知内容')
+            d = res['data'] if isinstance(res['data'], dict) else {}
+            content = d.get('content', '未知内容')
             # 如果内容太长，截取前20个字符加省略号
-            if len(content_preview) > 20:
-                content_preview = content_preview[:20] + "..."
+            content_preview = content if len(content) <= 20 else content[:20] + "…"
                 
             if res["success"]:
-                reminder_id = res['id']
-                type_str = {"once": "一次性", "daily": "每日", "weekly": "每周"}.get(res['data'].get('type'), "未知")
-                time_display = res['data'].get("time", "?")
+                typ = d.get('type')
+                time_display = d.get("time", "?")
                 
                 # 为周提醒格式化显示
-                if res['data'].get("type") == "weekly" and "weekday" in res['data']:
-                    weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-                    if 0 <= res['data']["weekday"] <= 6:
-                        time_display = f"{weekdays[res['data']['weekday']]} {time_display}"
+                weekday = d.get("weekday")
+                if typ == "weekly" and isinstance(weekday, int) and 0 <= weekday <= 6:
+                    time_display = f"{_WEEKDAYS[weekday]} {time_display}"
                 
-                # 单个提醒或多个提醒的第一个，不需要标签
-                if len(results) == 1:
-                    reply_parts.append(f"✅ 已为您设置{type_str}提醒:\n" 
-                                      f"时间: {time_display}\n" 
-                                      f"内容: {res['data'].get('content', '无')}")
-                else:
-                    reply_parts.append(f"✅ {res['label']}: {type_str}\n {time_display} - \"{content_preview}\"")
+                fields = {"label": res['label'], "type_str": _TYPE_STR_MAP.get(typ, "未知"),
+                          "time_display": time_display, "content": d.get('content', '无'),
+                          "content_preview": content_preview}
+                # 单个提醒不需要标签
+                reply_parts.append((_REPLY_SUCC_SINGLE if single else _REPLY_SUCC_MULTI).format_map(fields))
             else:
                 # 失败的提醒
-                if len(results) == 1:
-                    reply_parts.append(f"❌ 设置提醒失败: {res['error']}")
-                else:
-                    reply_parts.append(f"❌ {res['label']}: \"{content_preview}\" - {res['error']}")
+                fields = {"label": res['label'], "error": res['error'], "content_preview": content_preview}
+                reply_parts.append((_REPLY_FAIL_SINGLE if single else _REPLY_FAIL_MULTI).format_map(fields))
 
         # 发送汇总消息
-        ctx.send_text("\n".join(reply_parts), at_list)
+        job.send_text("\n".join(reply_parts))
 
         return True # 命令处理流程结束
 
     except Exception as e: # 捕获代码块顶层的其他潜在错误
-        at_list = ctx.msg.sender if ctx.is_group else ""
         error_message = f"处理提醒时发生意外错误: {str(e)}"
-        ctx.send_text(f"❌ {error_message}", at_list)
-        if ctx.logger:
-            ctx.logger.error(f"handle_reminder 顶层错误: {e}", exc_info=True)
+        job.send_text(f"❌ {error_message}")
+        if logger:
+            logger.error("_parse_and_save_reminders 顶层错误: %s", e, exc_info=True)
         return True
 
+# 查看提醒列表时各类型提醒的时间显示模板
+_LIST_TYPE_FMT = {
+    'once': "{tag}{ts} (一次性)",
+    'daily': "{tag}每天 {ts}",
+    'weekly_ok': "{tag}每周{wd} {ts}",
+    'weekly_bad': "{tag}每周 {ts}",
+}
+
+# 提醒列表的标题（后面空一行再列出各条提醒）
+_LIST_REMINDERS_HEADER = "📝 您设置的提醒列表（包括私聊和群聊）：\n\n"
+
+def _format_reminder(i: int, r: dict, all_contacts: dict) -> str:
+    """格式化提醒列表中的一行"""
+    # 添加设置位置标记（群聊/私聊），群名获取不到时用 roomid 前 8 位
+    roomid = r.get('roomid')
+    scope_tag = f"[群:{all_contacts.get(roomid) or roomid[:8]}]" if roomid else "[私聊]"
+
+    # 按类型选择时间显示模板，每周提醒的星期无效时退化为不带星期的模板
+    rtype = r['type']
+    weekday = r.get('weekday')
+    if rtype == 'weekly':
+        valid_weekday = isinstance(weekday, int) and 0 <= weekday <= 6
+        rtype = 'weekly_ok' if valid_weekday else 'weekly_bad'
+    time_display = _LIST_TYPE_FMT.get(rtype, "{ts}").format(
+        tag=scope_tag, ts=r['time_str'], wd=_WEEKDAYS[weekday] if rtype == 'weekly_ok' else ""
+    )
+    return f"{i}. [ID: {r['id'][:6]}] {time_display}: {r['content']}"
+
 def handle_list_reminders(ctx: 'MessageContext', match: Optional[Match]) -> bool:
     """处理查看提醒命令（支持群聊和私聊）"""
-    if not hasattr(ctx.robot, 'reminder_manager'):
-        ctx.send_text("❌ 内部错误：提醒管理器未初始化。", ctx.msg.sender if ctx.is_group else "")
+    reminder_manager = getattr(ctx.robot, 'reminder_manager', None)
+    if reminder_manager is None:
+        ctx.send_text("❌ 内部错误：提醒管理器未初始化。", ctx.at_list)
         return True
 
-    reminders = ctx.robot.reminder_manager.list_reminders(ctx.msg.sender)
+    reminders = reminder_manager.list_reminders(ctx.msg.sender)
     # 在群聊中@用户
-    at_list = ctx.msg.sender if ctx.is_group else ""
+    at_list = ctx.at_list
 
     if not reminders:
         ctx.send_text("您还没有设置任何提醒。", at_list)
         return True
 
-    reply_parts = ["📝 您设置的提醒列表（包括私聊和群聊）：\n"]
-    for i, r in enumerate(reminders):
-        # 格式化星期几（如果存在）
-        weekday_str = ""
-        if r.get("weekday") is not None:
-            weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-            weekday_str = f" (每周{weekdays[r['weekday']]})" if 0 <= r['weekday'] <= 6 else ""
-
-        # 格式化时间
-        time_display = r['time_str']
-        # 添加设置位置标记（群聊/私聊）
-        scope_tag = ""
-        if r.get('roomid'):
-            # 尝试获取群聊名称，如果获取不到就用 roomid
-            room_name = ctx.all_contacts.get(r['roomid']) or r['roomid'][:8]
-            scope_tag = f"[群:{room_name}]"
-        else:
-            scope_tag = "[私聊]"
-            
-        if r['type'] == 'once':
-            # 一次性提醒显示完整日期时间
-            time_display = f"{scope_tag}{r['time_str']} (一次性)"
-        elif r['type'] == 'daily':
-            time_display = f"{scope_tag}每天 {r['time_str']}"
-        elif r['type'] == 'weekly':
-            if 0 <= r.get('weekday', -1) <= 6:
-                time_display = f"{scope_tag}每周{weekdays[r['weekday']]} {r['time_str']}"
-            else:
-                time_display = f"{scope_tag}每周 {r['time_str']}"
-
-        reply_parts.append(
-            f"{i+1}. [ID: {r['id'][:6]}] {time_display}: {r['content']}"
-        )
-    ctx.send_text("\n".join(reply_parts), at_list)
+    all_contacts = ctx.all_contacts
+    reply = _LIST_REMINDERS_HEADER + "\n".join(
+        _format_reminder(i, r, all_contacts) for i, r in enumerate(reminders, 1)
+    )
+    ctx.send_text(reply, at_list)
         
     return True
 
-def handle_delete_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
-    """
-    处理删除提醒命令（支持群聊和私聊）。
-    检查消息是否包含"提醒"和"删"相关字眼，然后使用 AI 理解具体意图。
-    """
-    # 1. 获取用户输入的完整内容
-    raw_text = ctx.msg.content.strip()
-
-    # 2. 检查是否包含删除提醒的两个核心要素："提醒"和"删/删除/取消"
-    #    Regex 已经保证了后者，这里只需检查前者
-    if "提醒" not in raw_text:
-        # 如果消息匹配了 "删" 但没有 "提醒"，说明不是删除提醒的意图，不处理
-        return False # 返回 False，让命令路由器可以尝试匹配其他命令
-
-    # 3. 检查 ReminderManager 是否存在
-    if not hasattr(ctx.robot, 'reminder_manager'):
-        # 这个检查需要保留，是内部依赖
-        ctx.send_text("❌ 内部错误：提醒管理器未初始化。", ctx.msg.sender if ctx.is_group else "")
-        return True # 确实是想处理，但内部错误，返回 True
-
-    # 在群聊中@用户
-    at_list = ctx.msg.sender if ctx.is_group else ""
-
-    # --- 核心流程：直接使用 AI 分析 ---
-
-    # 4. 获取用户的所有提醒作为 AI 的上下文
-    reminders = ctx.robot.reminder_manager.list_reminders(ctx.msg.sender)
-    if not reminders:
-        # 如果用户没有任何提醒，直接告知
-        ctx.send_text("您当前没有任何提醒可供删除。", at_list)
-        return True
-
-    # 将提醒列表转换为 JSON 字符串给 AI 参考
-    try:
-        reminders_json_str = json.dumps(reminders, ensure_ascii=False, indent=2)
-    except Exception as e:
-         ctx.send_text("❌ 内部错误：准备数据给 AI 时出错。", at_list)
-         if ctx.logger: ctx.logger.error(f"序列化提醒列表失败: {e}", exc_info=True)
-         return True
-
-    # 5. 构造 AI Prompt (与之前相同，AI 需要能处理所有情况)
-    # 注意：确保 prompt 中的 {{ 和 }} 转义正确
-    sys_prompt = """
+# 提醒列表 JSON 的缓存，键为 (用户 wxid, ReminderManager.version)，提醒变动后版本号改变自动失效
+_REMINDERS_JSON_CACHE_SIZE = 128
+_reminders_json_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_reminders_json_lock = threading.Lock()
+
+# 发给 AI 的提醒内容最多保留的字符数
+_REMINDER_PROMPT_CONTENT_LEN = 60
+
+def _slim_reminders(reminders: list) -> list:
+    """只保留 AI 判断删除目标所需的字段，创建/触发时间等内部字段不发送，减少提示词 token"""
+    slim = []
+    for r in reminders:
+        item = {"id": r['id'], "type": r['type'], "time": r['time_str'],
+                "content": r['content'][:_REMINDER_PROMPT_CONTENT_LEN]}
+        if r['type'] == 'weekly':
+            item["weekday"] = r.get('weekday')
+        if r.get('roomid'):
+            item["group"] = True
+        slim.append(item)
+    return slim
+
+def _get_reminders_json(sender: str, version: Optional[int], reminders: list) -> str:
+    """序列化提醒列表供 AI 参考，同一用户在提醒未变动时复用上次的结果"""
+    if version is None:
+        return _json_dumps(_slim_reminders(reminders))
+    key = (sender, version)
+    with _reminders_json_lock:
+        cached = _reminders_json_cache.get(key)
+        if cached is not None:
+            _reminders_json_cache.move_to_end(key)
+            return cached
+    json_str = _json_dumps(_slim_reminders(reminders))
+    with _reminders_json_lock:
+        _reminders_json_cache[key] = json_str
+        while len(_reminders_json_cache) > _REMINDERS_JSON_CACHE_SIZE:
+            _reminders_json_cache.popitem(last=False)
+    return json_str
+
+# 删除提醒的系统提示词，内容固定不变以便命中模型服务端的前缀缓存；
+# 提醒列表和当前时间等每次变化的数据放在用户消息里（见 _DELETE_REMINDER_USER_MSG）
+_DELETE_REMINDER_SYS_PROMPT = """
 你是提醒删除助手。用户会提出删除提醒的请求。我会提供用户的**完整请求原文**，以及一个包含该用户所有当前提醒的 JSON 列表。
 
 你的任务是：根据用户请求和提醒列表，判断用户的意图，并确定要删除哪些提醒。用户可能要求删除特定提醒（通过描述内容、时间、ID等），也可能要求删除所有提醒。
@@ -853,130 +1123,272 @@ def handle_delete_reminder(ctx: 'MessageContext', match: Optional[Match]) -> boo
 
 1.  **删除特定提醒:** 如果你能明确匹配到一个或多个特定提醒，返回：
     ```json
-    {{
+    {
       "action": "delete_specific",
       "ids": ["<full_reminder_id_1>", "<full_reminder_id_2>", ...]
-    }}
+    }
     ```
     (`ids` 列表中包含所有匹配到的提醒的 **完整 ID**)
 
 2.  **删除所有提醒:** 如果用户明确表达了删除所有/全部提醒的意图，返回：
     ```json
-    {{
+    {
       "action": "delete_all"
-    }}
+    }
     ```
 
 3.  **需要澄清:** 如果用户描述模糊，匹配到多个可能的提醒，无法确定具体是哪个，返回：
     ```json
-    {{
+    {
       "action": "clarify",
       "message": "抱歉，您的描述可能匹配多个提醒，请问您想删除哪一个？（建议使用 ID 精确删除）",
-      "options": [ {{ "id": "id_prefix_1...", "description": "提醒1的简短描述(如: 周一 09:00 开会)" }}, ... ]
-    }}
+      "options": [ { "id": "id_prefix_1...", "description": "提醒1的简短描述(如: 周一 09:00 开会)" }, ... ]
+    }
     ```
     (`message` 是给用户的提示，`options` 包含可能的选项及其简短描述和 ID 前缀)
 
 4.  **未找到:** 如果在列表中找不到任何与用户描述匹配的提醒，返回：
     ```json
-    {{
+    {
       "action": "not_found",
       "message": "抱歉，在您的提醒列表中没有找到与您描述匹配的提醒。"
-    }}
+    }
     ```
 
 5.  **错误:** 如果处理中遇到问题或无法理解请求，返回：
     ```json
-    {{
+    {
       "action": "error",
       "message": "抱歉，处理您的删除请求时遇到问题。"
-    }}
+    }
     ```
 
 **重要:**
 -   仔细分析用户的**完整请求原文**和提供的提醒列表 JSON 进行匹配。
 -   用户请求中可能直接包含 ID，也需要你能识别并匹配。
 -   匹配时要综合考虑内容、时间、类型（一次性/每日/每周）等信息。
+-   提醒列表中每项字段：`id` 提醒ID，`type` 类型 (once/daily/weekly)，`time` 时间，`content` 内容，`weekday` 周几 (仅每周提醒，周一=0)，`group` 为 true 表示在群聊中设置。
 -   如果返回 `delete_specific`，必须提供 **完整** 的 reminder ID。
 -   **只输出 JSON 结构，不要包含任何额外的解释性文字。**
+"""
 
-用户的提醒列表如下 (JSON 格式):
-{reminders_list_json}
+# 删除提醒时发送给 AI 的用户消息：当前时间、提醒列表和用户请求
+_DELETE_REMINDER_USER_MSG = "当前时间（供参考）: {current_datetime}\n用户的提醒列表如下 (JSON 格式):\n{reminders_list_json}\n\n{request}"
+
+# 删除提醒解析最多尝试次数，以及每次重试时追加在用户消息末尾的提示（按尝试序号索引）
+_DELETE_REMINDER_MAX_RETRIES = 3
+_DELETE_REMINDER_RETRY_SUFFIXES = tuple(
+    f"\n\n**重要提示:** 这是第{attempt+1}次尝试。你之前的回复格式有误，无法被解析为有效的JSON。请确保你的回复仅包含有效的JSON对象，没有其他任何文字。"
+    for attempt in range(_DELETE_REMINDER_MAX_RETRIES)
+)
+
+# AI 删除提醒回复中允许的 action
+_DELETE_ACTIONS = frozenset({"delete_specific", "delete_all", "clarify", "not_found", "error"})
+
+def _validate_delete_response(resp: Any) -> None:
+    """校验 AI 删除提醒回复的结构，不符合约定时抛出 ValueError 以触发重试"""
+    if not isinstance(resp, dict):
+        raise ValueError("AI 返回的不是 JSON 对象")
+    action = resp.get("action")
+    if action not in _DELETE_ACTIONS:
+        raise ValueError(f"AI 返回的 action 无效: {action!r}")
+    if action == "delete_specific":
+        ids = resp.get("ids")
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+            raise ValueError("delete_specific 缺少有效的 ids 字符串列表")
+    if "message" in resp and not isinstance(resp["message"], str):
+        raise ValueError("message 字段必须是字符串")
+    if "options" in resp and not (isinstance(resp["options"], list) and all(isinstance(o, dict) for o in resp["options"])):
+        raise ValueError("options 字段必须是对象列表")
+
+# AI 删除意图解析结果缓存，键为 (用户 wxid, 归一化的请求原文, ReminderManager.version)
+_DELETE_INTENT_CACHE_SIZE = 512
+_delete_intent_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_delete_intent_lock = threading.Lock()
+
+# 删除提醒的快速路径：整条消息只是"删除提醒 + 提醒ID"（列表中显示 ID 前 6 位，可带 "ID:" 标注）时才不经 AI 直接删除
+_REMINDER_ID_TOKEN = r'(?:ID\s*[:：]?\s*)?[0-9a-f][0-9a-f-]{5,35}'
+_DELETE_BY_ID_RE = re.compile(
+    r'^(?:请|帮我)?(?:删除|删掉|删|取消)(?:一下)?(?:提醒)?\s*'
+    rf'(?P<ids>{_REMINDER_ID_TOKEN}(?:\s*[,，、和\s]\s*{_REMINDER_ID_TOKEN})*)'
+    r'\s*(?:的?提醒)?\s*[。.!！]?$',
+    re.IGNORECASE
+)
+_REMINDER_ID_ITEM_RE = re.compile(r'(ID\s*[:：]?\s*)?([0-9a-f][0-9a-f-]{5,35})', re.IGNORECASE)
+# 只有一个提醒时，完整说出这些话才直接删除它
+_DELETE_ONLY_REMINDER_PHRASES = frozenset({'删除全部提醒', '删除所有提醒', '取消全部提醒', '取消所有提醒'})
+
+# 排序后的提醒 ID 列表缓存，键与 _reminders_json_cache 相同，提醒变动后版本号改变自动失效
+_SORTED_REMINDER_IDS_CACHE_SIZE = 128
+_sorted_reminder_ids_cache: "OrderedDict[tuple, list]" = OrderedDict()
+_sorted_reminder_ids_lock = threading.Lock()
+
+def _get_sorted_reminder_ids(sender: str, version: Optional[int], reminders: list) -> list:
+    """返回排序后的提醒 ID 列表，同一用户在提醒未变动时复用上次的结果"""
+    if version is None:
+        return sorted(r['id'] for r in reminders)
+    key = (sender, version)
+    with _sorted_reminder_ids_lock:
+        cached = _sorted_reminder_ids_cache.get(key)
+        if cached is not None:
+            _sorted_reminder_ids_cache.move_to_end(key)
+            return cached
+    sorted_ids = sorted(r['id'] for r in reminders)
+    with _sorted_reminder_ids_lock:
+        _sorted_reminder_ids_cache[key] = sorted_ids
+        while len(_sorted_reminder_ids_cache) > _SORTED_REMINDER_IDS_CACHE_SIZE:
+            _sorted_reminder_ids_cache.popitem(last=False)
+    return sorted_ids
+
+def _match_delete_fast_path(raw_text: str, reminders: list, sender: str, version: Optional[int]) -> Optional[dict]:
+    """
+    不调用 AI 就能确定删除目标时，返回与 AI 回复相同结构的 delete_specific 指令，否则返回 None。
+    - 整条消息只是删除命令加一个或多个 ID，且每个 ID 前缀都恰好匹配一个提醒时，删除这些提醒
+      （不带 "ID:" 标注的纯数字串可能是日期或号码，交给 AI 判断）
+    - 用户只有一个提醒且整条消息就是"删除全部提醒"等固定说法时，删除这一个
+    """
+    text = raw_text.strip()
+    if len(reminders) == 1 and text.rstrip('。.!！') in _DELETE_ONLY_REMINDER_PHRASES:
+        return {"action": "delete_specific", "ids": [reminders[0]['id']]}
+
+    id_match = _DELETE_BY_ID_RE.match(text)
+    if id_match:
+        prefixes = []
+        for label, token in _REMINDER_ID_ITEM_RE.findall(id_match.group('ids')):
+            if not label and token.replace('-', '').isdigit():
+                return None
+            prefixes.append(token.lower())
+        # ID 排序后，以某前缀开头的 ID 是连续的一段，二分定位即可，无需逐个比较
+        sorted_ids = _get_sorted_reminder_ids(sender, version, reminders)
+        ids = []
+        for prefix in prefixes:
+            pos = bisect_left(sorted_ids, prefix)
+            if pos >= len(sorted_ids) or not sorted_ids[pos].startswith(prefix):
+                return None
+            if pos + 1 < len(sorted_ids) and sorted_ids[pos + 1].startswith(prefix):
+                return None # 前缀不唯一，交给 AI 判断
+            if sorted_ids[pos] not in ids:
+                ids.append(sorted_ids[pos])
+        return {"action": "delete_specific", "ids": ids}
+    return None
 
-当前时间（供参考）: {current_datetime}
-"""
-    current_dt_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    try:
-        # 将用户的自然语言请求和提醒列表JSON传入Prompt
-        formatted_prompt = sys_prompt.format(
-            reminders_list_json=reminders_json_str,
-            current_datetime=current_dt_str
-        )
-    except KeyError as e:
-         ctx.send_text("❌ 内部错误：构建 AI 请求时出错。", at_list)
-         if ctx.logger: ctx.logger.error(f"格式化删除提醒 prompt 失败: {e}，可能是 sys_prompt 中的 {{}} 未正确转义", exc_info=True)
-         return True
+def handle_delete_reminder(ctx: 'MessageContext', match: Optional[Match]) -> bool:
+    """
+    处理删除提醒命令（支持群聊和私聊）。
+    检查消息是否包含"提醒"和"删"相关字眼，然后使用 AI 理解具体意图。
+    """
+    # 1. 获取用户输入的完整内容
+    raw_text = ctx.msg.content.strip()
+
+    # 2. 检查是否包含删除提醒的两个核心要素："提醒"和"删/删除/取消"
+    #    Regex 已经保证了后者，这里只需检查前者
+    if "提醒" not in raw_text:
+        # 如果消息匹配了 "删" 但没有 "提醒"，说明不是删除提醒的意图，不处理
+        return False # 返回 False，让命令路由器可以尝试匹配其他命令
+
+    # 3. 检查 ReminderManager 是否存在
+    reminder_manager = getattr(ctx.robot, 'reminder_manager', None)
+    if reminder_manager is None:
+        # 这个检查需要保留，是内部依赖
+        ctx.send_text("❌ 内部错误：提醒管理器未初始化。", ctx.at_list)
+        return True # 确实是想处理，但内部错误，返回 True
+
+    # 在群聊中@用户；后续多次用到的属性先绑定为局部变量
+    at_list = ctx.at_list
+    sender = ctx.msg.sender
+
+    # --- 核心流程：直接使用 AI 分析 ---
+
+    # 4. 获取用户的所有提醒作为 AI 的上下文（先取版本号，保证缓存的内容不会比版本号旧）
+    reminders_version = getattr(reminder_manager, 'version', None)
+    reminders = reminder_manager.list_reminders(sender)
+    if not reminders:
+        # 如果用户没有任何提醒，直接告知
+        ctx.send_text("您当前没有任何提醒可供删除。", at_list)
+        return True
+
+    # 能直接确定要删除哪个提醒时跳过 AI 调用，也无需准备提示词
+    parsed_ai_response = _match_delete_fast_path(ctx.text or raw_text, reminders, sender, reminders_version)
+    intent_key = None
+    if parsed_ai_response is None and reminders_version is not None:
+        # 提醒未变动时，同一用户的相同请求直接复用上次 AI 的解析结果
+        intent_key = (sender, raw_text.strip().lower(), reminders_version)
+        with _delete_intent_lock:
+            parsed_ai_response = _delete_intent_cache.get(intent_key)
+            if parsed_ai_response is not None:
+                _delete_intent_cache.move_to_end(intent_key)
+    ai_parsing_success = parsed_ai_response is not None
+    ai_response = None
+
+    if not ai_parsing_success:
+        # 将提醒列表转换为 JSON 字符串给 AI 参考
+        try:
+            reminders_json_str = _get_reminders_json(sender, reminders_version, reminders)
+        except Exception as e:
+             ctx.send_text("❌ 内部错误：准备数据给 AI 时出错。", at_list)
+             if ctx.logger: ctx.logger.error("序列化提醒列表失败: %s", e, exc_info=True)
+             return True
 
+        # 5. 构造 AI Prompt：系统提示词固定，提醒列表与当前时间随用户消息发送
+        current_dt_str = _current_datetime_str()
+        formatted_prompt = _DELETE_REMINDER_SYS_PROMPT
 
-    # 6. 调用 AI (使用完整的用户原始输入)
-    q_for_ai = f"请根据以下用户完整请求，分析需要删除哪个提醒：\n{raw_text}" # 使用 raw_text
+        # 6. 调用 AI (使用完整的用户原始输入)
+        q_for_ai = _DELETE_REMINDER_USER_MSG.format(
+            current_datetime=current_dt_str,
+            reminders_list_json=reminders_json_str,
+            request=f"请根据以下用户完整请求，分析需要删除哪个提醒：\n{raw_text}" # 使用 raw_text
+        )
     try:
-        if not hasattr(ctx, 'chat') or not ctx.chat:
+        if ai_parsing_success:
+            if ctx.logger:
+                ctx.logger.info("删除提醒无需调用AI，直接使用已知结果: %s", parsed_ai_response)
+        elif not ctx.chat:
             raise ValueError("当前上下文中没有可用的AI模型")
 
         # 实现最多尝试3次解析AI回复的逻辑
-        max_retries = 3
+        max_retries = _DELETE_REMINDER_MAX_RETRIES
         retry_count = 0
-        parsed_ai_response = None
-        ai_parsing_success = False
         
         while retry_count < max_retries and not ai_parsing_success:
             # 如果是重试，更新提示信息
             if retry_count > 0:
-                enhanced_prompt = sys_prompt + f"\n\n**重要提示:** 这是第{retry_count+1}次尝试。你之前的回复格式有误，无法被解析为有效的JSON。请确保你的回复仅包含有效的JSON对象，没有其他任何文字。"
-                try:
-                    formatted_prompt = enhanced_prompt.format(
-                        reminders_list_json=reminders_json_str,
-                        current_datetime=current_dt_str
-                    )
-                except Exception as e:
-                    ctx.send_text("❌ 内部错误：构建重试请求时出错。", at_list)
-                    if ctx.logger: ctx.logger.error(f"格式化重试 prompt 失败: {e}", exc_info=True)
-                    return True
-                    
-                # 在重试时提供更明确的信息
-                retry_q = f"请再次分析以下删除提醒请求，并返回严格的JSON格式(第{retry_count+1}次尝试):\n{raw_text}"
-                q_for_ai = retry_q
+                # 系统提示词保持不变（利于命中前缀缓存），重试提示只追加在用户消息中
+                q_for_ai = _DELETE_REMINDER_USER_MSG.format(
+                    current_datetime=current_dt_str,
+                    reminders_list_json=reminders_json_str,
+                    request=f"请再次分析以下删除提醒请求，并返回严格的JSON格式(第{retry_count+1}次尝试):\n{raw_text}"
+                ) + _DELETE_REMINDER_RETRY_SUFFIXES[retry_count]
 
             # 获取AI回答
             ai_response = ctx.chat.get_answer(q_for_ai, ctx.get_receiver(), system_prompt_override=formatted_prompt)
 
             # 7. 解析 AI 的 JSON 回复
-            json_str = None
-            json_match_obj = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match_obj:
-                json_str = json_match_obj.group(0)
-            else:
-                json_str = ai_response
+            # 单次扫描截取第一个顶层 JSON 对象，找不到时直接尝试解析原始回复
+            json_str = _extract_json(ai_response, (dict,)) or ai_response
 
             try:
-                parsed_ai_response = json.loads(json_str)
-                if not isinstance(parsed_ai_response, dict) or "action" not in parsed_ai_response:
-                    raise ValueError("AI 返回的 JSON 格式不符合预期（缺少 action 字段）")
+                parsed_ai_response = _json_loads(json_str)
+                _validate_delete_response(parsed_ai_response)
                     
                 # 如果能到这里，说明解析成功
                 ai_parsing_success = True
+                if intent_key is not None:
+                    with _delete_intent_lock:
+                        _delete_intent_cache[intent_key] = parsed_ai_response
+                        while len(_delete_intent_cache) > _DELETE_INTENT_CACHE_SIZE:
+                            _delete_intent_cache.popitem(last=False)
                 
             except (json.JSONDecodeError, ValueError) as e:
                 # JSON解析失败
                 retry_count += 1
                 if ctx.logger: 
-                    ctx.logger.warning(f"AI 删除提醒 JSON 解析失败(第{retry_count}次尝试): {ai_response}, 错误: {str(e)}")
+                    ctx.logger.warning("AI 删除提醒 JSON 解析失败(第%s次尝试): %s, 错误: %s", retry_count, ai_response, str(e))
                 
                 if retry_count >= max_retries:
                     # 达到最大重试次数，返回错误
                     ctx.send_text(f"❌ 抱歉，无法理解您的删除提醒请求。请尝试换一种方式表达，或使用提醒ID进行精确删除。", at_list)
-                    if ctx.logger: ctx.logger.error(f"解析AI删除提醒回复失败，已达到最大重试次数({max_retries}): {ai_response}")
+                    if ctx.logger: ctx.logger.error("解析AI删除提醒回复失败，已达到最大重试次数(%s): %s", max_retries, ai_response)
                     return True
                 # 否则继续下一次循环重试
 
@@ -993,34 +1405,37 @@ def handle_delete_reminder(ctx: 'MessageContext', match: Optional[Match]) -> boo
             successful_deletes = 0
             deleted_descriptions = []
 
-            for r_id in reminder_ids_to_delete:
-                original_reminder = next((r for r in reminders if r['id'] == r_id), None)
+            reminders_by_id = {r['id']: r for r in reminders}
+            # 所有删除在一个事务中完成
+            batch_results = reminder_manager.delete_reminders_batch(sender, reminder_ids_to_delete)
+            for r_id, (success, message) in zip(reminder_ids_to_delete, batch_results):
+                original_reminder = reminders_by_id.get(r_id)
                 desc = f"ID:{r_id[:6]}..."
                 if original_reminder:
                     desc = f"ID:{r_id[:6]}... 内容: \"{original_reminder['content'][:20]}...\""
 
-                success, message = ctx.robot.reminder_manager.delete_reminder(ctx.msg.sender, r_id)
                 delete_results.append({"id": r_id, "success": success, "message": message, "description": desc})
                 if success:
                     successful_deletes += 1
                     deleted_descriptions.append(desc)
 
             if successful_deletes == len(reminder_ids_to_delete):
-                reply_msg = f"✅ 已删除 {successful_deletes} 个提醒:\n" + "\n".join([f"- {d}" for d in deleted_descriptions])
+                reply_parts = [f"✅ 已删除 {successful_deletes} 个提醒:"]
+                reply_parts.extend(f"- {d}" for d in deleted_descriptions)
             elif successful_deletes > 0:
-                reply_msg = f"⚠️ 部分提醒删除完成 ({successful_deletes}/{len(reminder_ids_to_delete)}):\n"
-                for res in delete_results:
-                    status = "✅ 成功" if res["success"] else f"❌ 失败: {res['message']}"
-                    reply_msg += f"- {res['description']}: {status}\n"
+                reply_parts = [f"⚠️ 部分提醒删除完成 ({successful_deletes}/{len(reminder_ids_to_delete)}):"]
+                reply_parts.extend(
+                    f"- {res['description']}: " + ("✅ 成功" if res["success"] else f"❌ 失败: {res['message']}")
+                    for res in delete_results
+                )
             else:
-                reply_msg = f"❌ 未能删除 AI 指定的提醒。\n"
-                for res in delete_results:
-                     reply_msg += f"- {res['description']}: 失败原因: {res['message']}\n"
+                reply_parts = ["❌ 未能删除 AI 指定的提醒。"]
+                reply_parts.extend(f"- {res['description']}: 失败原因: {res['message']}" for res in delete_results)
 
-            ctx.send_text(reply_msg.strip(), at_list)
+            ctx.send_text("\n".join(reply_parts), at_list)
 
         elif action == "delete_all":
-            success, message, count = ctx.robot.reminder_manager.delete_all_reminders(ctx.msg.sender)
+            success, message, count = reminder_manager.delete_all_reminders(sender)
             ctx.send_text(message, at_list)
 
         elif action in ["clarify", "not_found", "error"]:
@@ -1032,81 +1447,109 @@ def handle_delete_reminder(ctx: 'MessageContext', match: Optional[Match]) -> boo
 
         else:
             ctx.send_text("❌ AI 返回了无法理解的指令。", at_list)
-            if ctx.logger: ctx.logger.error(f"AI 删除提醒返回未知 action: {action} - Response: {ai_response}")
+            if ctx.logger: ctx.logger.error("AI 删除提醒返回未知 action: %s - Response: %s", action, ai_response)
 
         return True # AI 处理流程结束
 
     except Exception as e: # 捕获 AI 调用和处理过程中的其他顶层错误
         ctx.send_text(f"❌ 处理删除提醒时发生意外错误。", at_list)
         if ctx.logger:
-            ctx.logger.error(f"handle_delete_reminder AI 部分顶层错误: {e}", exc_info=True)
+            ctx.logger.error("handle_delete_reminder AI 部分顶层错误: %s", e, exc_info=True)
         return True
 
-def handle_weather_forecast(ctx: 'MessageContext', match: Optional[Match]) -> bool:
-    """
-    处理 "天气预报" 或 "预报" 命令
-
-    匹配: 天气预报 [城市名] 或 预报 [城市名]
-    """
-    if not match:
-        return False
-
-    city_name = match.group(1).strip()
-    if not city_name:
-        ctx.send_text("🤔 请告诉我你想查询哪个城市的天气预报，例如：天气预报 北京")
-        return True
-
-    if ctx.logger:
-        ctx.logger.info(f"天气预报查询指令匹配: 城市={city_name}")
-
-    # --- 加载城市代码 ---
-    city_codes: Dict[str, str] = {}
-    city_code_path = os.path.join(os.path.dirname(__file__), '..', 'function', 'main_city.json') # 确保路径正确
+# 城市名到天气城市代码的映射文件，首次查询时加载并常驻内存
+_CITY_CODE_PATH = os.path.join(os.path.dirname(__file__), '..', 'function', 'main_city.json')
+_city_codes: Optional[Dict[str, str]] = None
+_city_substr_index: Dict[str, List[str]] = {}  # 城市名的任意子串 -> 包含该子串的城市名列表 (保持文件中的顺序)
+_city_codes_lock = threading.Lock()
+
+def _get_city_codes() -> Dict[str, str]:
+    """获取城市代码映射，加载失败时抛出异常且不缓存，下次调用会重试"""
+    global _city_codes, _city_substr_index
+    if _city_codes is None:
+        with _city_codes_lock:
+            if _city_codes is None:
+                with open(_CITY_CODE_PATH, 'rb') as f:
+                    codes = _json_loads(f.read())
+                # 城市名都很短，直接枚举全部子串建立模糊匹配索引
+                index: Dict[str, List[str]] = {}
+                for name in codes:
+                    substrs = {name[i:j] for i in range(len(name)) for j in range(i + 1, len(name) + 1)}
+                    for sub in substrs:
+                        index.setdefault(sub, []).append(name)
+                _city_substr_index = index
+                _city_codes = codes
+    return _city_codes
+
+def _find_city_fuzzy(city_name: str) -> Optional[str]:
+    """返回第一个包含 city_name 的完整城市名，找不到返回 None (需先调用 _get_city_codes)"""
+    names = _city_substr_index.get(city_name)
+    return names[0] if names else None
+
+def reply_weather(ctx: 'MessageContext', city_name: str) -> bool:
+    """查找城市代码并回复该城市的天气（含预报），天气命令与AI路由共用"""
+    # --- 加载城市代码 (进程内只读取一次) ---
     try:
-        with open(city_code_path, 'r', encoding='utf-8') as f:
-            city_codes = json.load(f)
+        city_codes = _get_city_codes()
     except FileNotFoundError:
         if ctx.logger:
-            ctx.logger.error(f"城市代码文件未找到: {city_code_path}")
+            ctx.logger.error("城市代码文件未找到: %s", _CITY_CODE_PATH)
         ctx.send_text("⚠️ 抱歉，天气功能所需的城市列表文件丢失了。")
         return True
     except json.JSONDecodeError:
         if ctx.logger:
-            ctx.logger.error(f"无法解析城市代码文件: {city_code_path}")
+            ctx.logger.error("无法解析城市代码文件: %s", _CITY_CODE_PATH)
         ctx.send_text("⚠️ 抱歉，天气功能的城市列表文件格式错误。")
         return True
     except Exception as e:
-         if ctx.logger:
-            ctx.logger.error(f"加载城市代码时发生未知错误: {e}", exc_info=True)
-         ctx.send_text("⚠️ 抱歉，加载城市代码时发生错误。")
-         return True
+        if ctx.logger:
+            ctx.logger.error("加载城市代码时发生未知错误: %s", e, exc_info=True)
+        ctx.send_text("⚠️ 抱歉，加载城市代码时发生错误。")
+        return True
     # --- 城市代码加载完毕 ---
 
     city_code = city_codes.get(city_name)
 
     if not city_code:
-        # 尝试模糊匹配 (可选，如果需要)
-        found = False
-        for name, code in city_codes.items():
-            if city_name in name: # 如果输入的名字是城市全名的一部分
-                city_code = code
-                city_name = name # 使用找到的完整城市名
-                if ctx.logger:
-                    ctx.logger.info(f"城市 '{match.group(1).strip()}' 未精确匹配，使用模糊匹配结果: {city_name} ({city_code})")
-                found = True
-                break
-        if not found:
+        # 尝试模糊匹配：输入的名字是城市全名的一部分
+        full_name = _find_city_fuzzy(city_name)
+        if full_name:
+            city_code = city_codes[full_name]
+            if ctx.logger:
+                ctx.logger.info("城市 '%s' 未精确匹配，使用模糊匹配结果: %s (%s)", city_name, full_name, city_code)
+            city_name = full_name # 使用找到的完整城市名
+        else:
             ctx.send_text(f"😕 找不到城市 '{city_name}' 的天气信息，请检查城市名称是否正确。")
             return True
 
     # 获取天气信息 (包含预报)
     try:
-        from function.func_weather import Weather
+        if Weather is None:
+            raise ImportError("无法导入 func_weather 模块")
         weather_info = Weather(city_code).get_weather(include_forecast=True)  # 注意这里传入True
         ctx.send_text(weather_info)
     except Exception as e:
         if ctx.logger:
-            ctx.logger.error(f"获取城市 {city_name}({city_code}) 天气预报时出错: {e}", exc_info=True)
+            ctx.logger.error("获取城市 %s(%s) 天气预报时出错: %s", city_name, city_code, e, exc_info=True)
         ctx.send_text(f"😥 获取 {city_name} 天气预报时遇到问题，请稍后再试。")
 
-    return True
\ No newline at end of file
+    return True
+
+def handle_weather_forecast(ctx: 'MessageContext', match: Optional[Match]) -> bool:
+    """
+    处理 "天气预报" 或 "预报" 命令
+
+    匹配: 天气预报 [城市名] 或 预报 [城市名]
+    """
+    if not match:
+        return False
+
+    city_name = match.group(1).strip()
+    if not city_name:
+        ctx.send_text(_WEATHER_EMPTY_MSG)
+        return True
+
+    if ctx.logger:
+        ctx.logger.info("天气预报查询指令匹配: 城市=%s", city_name)
+
+    return reply_weather(ctx, city_name)
@@ -1,6 +1,6 @@
 import re
 from dataclasses import dataclass
-from typing import Pattern, Callable, Literal, Optional, Any, Union, Match
+from typing import Pattern, Callable, Literal, Optional, Any, Union, Match, Tuple
 
 # 导入 MessageContext，使用前向引用避免循环导入
 from typing import TYPE_CHECKING
@@ -20,12 +20,16 @@ class Command:
     need_at: bool = False     # 在群聊中是否必须@机器人才能触发
     priority: int = 100       # 优先级，数字越小越先匹配
     description: str = ""     # 命令的描述，用于生成帮助信息
+    keywords: Tuple[str, ...] = ()  # 触发命令必须包含的关键字（任一即可），用于路由前快速排除；为空表示不预筛
 
     def __post_init__(self):
         """验证命令配置的有效性"""
         if self.scope not in ["group", "private", "both"]:
             raise ValueError(f"无效的作用域: {self.scope}，必须是 'group', 'private' 或 'both'")
         
+        # 关键字统一存为小写，路由时与小写化的消息比较（命令正则大多忽略大小写）
+        self.keywords = tuple(kw.lower() for kw in self.keywords)
+        
         # 检查pattern是否为正则表达式或可调用对象
         if not isinstance(self.pattern, (Pattern, Callable)):
             # 如果是字符串，尝试转换为正则表达式
@@ -35,4 +39,8 @@ class Command:
                 except re.error:
                     raise ValueError(f"无效的正则表达式: {self.pattern}")
             else:
-                raise TypeError(f"pattern 必须是正则表达式或可调用对象，而不是 {type(self.pattern)}") 
\ No newline at end of file
+                raise TypeError(f"pattern 必须是正则表达式或可调用对象，而不是 {type(self.pattern)}")
+        
+        # 预先确定匹配方式并绑定 search 方法，路由时无需每次判断类型和查找属性
+        self._is_regex = not callable(self.pattern)
+        self._search = self.pattern.search if self._is_regex else None
@@ -1,4 +1,5 @@
 import re
+from operator import attrgetter
 from .models import Command
 from .handlers import (
     handle_help, 
@@ -16,12 +17,13 @@ COMMANDS = [
     # ======== 基础系统命令 ========
     Command(
         name="help",
-        pattern=re.compile(r"^(info|帮助|指令)$", re.IGNORECASE),
+        pattern=re.compile(r"^(?:info|帮助|指令)$", re.IGNORECASE),
         scope="both",       # 群聊和私聊都支持
         need_at=False,      # 不需要@机器人
         priority=10,        # 优先级较高
         handler=handle_help,
-        description="显示机器人的帮助信息"
+        description="显示机器人的帮助信息",
+        keywords=("info", "帮助", "指令")
     ),
     
     # ======== Perplexity AI 命令 ========
@@ -32,28 +34,31 @@ COMMANDS = [
         need_at=True,       # 需要@机器人
         priority=25,        # 较高优先级，确保在闲聊之前处理
         handler=handle_perplexity_ask,
-        description="使用 Perplexity AI 进行深度查询"
+        description="使用 Perplexity AI 进行深度查询",
+        keywords=("ask",)
     ),
     
     # ======== 消息管理命令 ========
     Command(
         name="summary",
-        pattern=re.compile(r"^(summary|总结)$", re.IGNORECASE),
+        pattern=re.compile(r"^(?:summary|总结)$", re.IGNORECASE),
         scope="group",      # 仅群聊支持
         need_at=True,       # 需要@机器人
         priority=30,        # 优先级一般
         handler=handle_summary,
-        description="总结群聊最近的消息"
+        description="总结群聊最近的消息",
+        keywords=("summary", "总结")
     ),
     
     Command(
         name="clear_messages",
-        pattern=re.compile(r"^(clearmessages|清除历史)$", re.IGNORECASE),
+        pattern=re.compile(r"^(?:clearmessages|清除历史)$", re.IGNORECASE),
         scope="group",      # 仅群聊支持
         need_at=True,       # 需要@机器人
         priority=31,        # 优先级一般
         handler=handle_clear_messages,
-        description="从数据库中清除群聊的历史消息记录"
+        description="从数据库中清除群聊的历史消息记录",
+        keywords=("clearmessages", "清除历史")
     ),
     
     # ======== 提醒功能 ========
@@ -64,17 +69,19 @@ COMMANDS = [
         need_at=True,    # 在群聊中需要@机器人
         priority=35,        # 优先级适中，在基础命令后，复杂功能或闲聊前
         handler=handle_reminder,
-        description="设置一个提醒 (包含 '提醒我' 关键字即可, 例如：提醒我明天下午3点开会)"
+        description="设置一个提醒 (包含 '提醒我' 关键字即可, 例如：提醒我明天下午3点开会)",
+        keywords=("提醒我",)
     ),
     
     Command(
         name="list_reminders",
-        pattern=re.compile(r"^(查看提醒|我的提醒|提醒列表)$", re.IGNORECASE),
+        pattern=re.compile(r"^(?:查看提醒|我的提醒|提醒列表)$", re.IGNORECASE),
         scope="both",    # 支持群聊和私聊
         need_at=True,    # 在群聊中需要@机器人
         priority=36, # 优先级略低于设置提醒
         handler=handle_list_reminders,
-        description="查看您设置的所有提醒"
+        description="查看您设置的所有提醒",
+        keywords=("查看提醒", "我的提醒", "提醒列表")
     ),
     
     Command(
@@ -85,7 +92,8 @@ COMMANDS = [
         need_at=True,    # 在群聊中需要@机器人
         priority=37,
         handler=handle_delete_reminder,
-        description="删除提醒 (包含'删'和'提醒'关键字即可，如: 把开会的提醒删了)"
+        description="删除提醒 (包含'删'和'提醒'关键字即可，如: 把开会的提醒删了)",
+        keywords=("删", "取消")
     ),
 
     # ======== 新闻和实用工具 ========
@@ -96,7 +104,8 @@ COMMANDS = [
         need_at=True,      # 需要@机器人
         priority=38,       # 优先级比天气高一点
         handler=handle_weather_forecast,
-        description="查询指定城市未来几天的天气预报 (例如：天气预报 北京)"
+        description="查询指定城市未来几天的天气预报 (例如：天气预报 北京)",
+        keywords=("天气",)
     ),
     
     Command(
@@ -106,7 +115,8 @@ COMMANDS = [
         need_at=True,      # 需要@机器人
         priority=40,        # 优先级一般
         handler=handle_news_request,
-        description="获取最新新闻"
+        description="获取最新新闻",
+        keywords=("新闻",)
     ),
     
     # ======== 骂人命令 ========
@@ -117,11 +127,15 @@ COMMANDS = [
         need_at=True,       # 需要@机器人
         priority=100,        # 优先级较高
         handler=handle_insult,
-        description="骂指定用户"
+        description="骂指定用户",
+        keywords=("骂一下",)
     ),
     
 ]
 
+# 导入时按优先级排好序（稳定排序，同优先级保持定义顺序），路由器可直接使用
+COMMANDS.sort(key=attrgetter("priority"))
+
 # 可以添加一个函数，获取命令列表的简单描述
 def get_commands_info():
     """获取所有命令的简要信息，用于调试"""
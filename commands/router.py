@@ -15,10 +15,23 @@ class CommandRouter:
     命令路由器，负责将消息路由到对应的命令处理函数
     """
     def __init__(self, commands: List[Command], robot_instance: Optional[Any] = None):
-        # 按优先级排序命令列表，数字越小优先级越高
-        self.commands = sorted(commands, key=lambda cmd: cmd.priority)
+        # 按优先级排序命令列表，数字越小优先级越高；registry.COMMANDS 导入时已排好序，无需再排
+        if all(a.priority <= b.priority for a, b in zip(commands, commands[1:])):
+            self.commands = list(commands)
+        else:
+            self.commands = sorted(commands, key=lambda cmd: cmd.priority)
         self.robot_instance = robot_instance
         
+        # 按消息场景预先筛选可用命令（保持优先级顺序），分发时不必逐个检查作用域和@要求
+        self._private_commands = [cmd for cmd in self.commands if cmd.scope != "group"]
+        self._group_commands = [cmd for cmd in self.commands if cmd.scope != "private" and not cmd.need_at]
+        self._group_at_commands = [cmd for cmd in self.commands if cmd.scope != "private"]
+        
+        # 每个场景的关键字预筛正则：消息不含任何命令关键字时（多数闲聊），一次搜索即可跳过全部命令
+        self._private_prefilter = self._build_prefilter(self._private_commands)
+        self._group_prefilter = self._build_prefilter(self._group_commands)
+        self._group_at_prefilter = self._build_prefilter(self._group_at_commands)
+        
         # 分析并输出命令注册信息，便于调试
         scope_count = {"group": 0, "private": 0, "both": 0}
         for cmd in commands:
@@ -33,6 +46,19 @@ class CommandRouter:
         if len(self.commands) > 10:
             logger.info(f"... 共 {len(self.commands)} 个命令")
 
+    @staticmethod
+    def _build_prefilter(commands: List[Command]) -> Optional["re.Pattern"]:
+        """
+        将一组命令的关键字合并为一个正则，用于分发前快速排除
+        :return: 任一命令未声明关键字时无法安全预筛，返回 None
+        """
+        if not commands or any(not cmd.keywords for cmd in commands):
+            return None
+        keywords = {kw for cmd in commands for kw in cmd.keywords}
+        # 长关键字在前，避免被其前缀抢先匹配（仅影响效率，不影响结果）
+        alternation = "|".join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+        return re.compile(alternation, re.IGNORECASE)
+
     def dispatch(self, ctx: MessageContext) -> bool:
         """
         根据消息上下文分发命令
@@ -45,34 +71,43 @@ class CommandRouter:
             # 如果robot有logger属性且ctx没有logger，则使用robot的logger
             if hasattr(self.robot_instance, 'LOG') and not ctx.logger:
                 ctx.logger = self.robot_instance.LOG
+            # 构造时未能解析的AI模型，在补齐robot后再解析一次
+            if ctx.chat is None:
+                ctx.chat = getattr(self.robot_instance, 'chat', None)
         
         # 记录日志，便于调试
-        if ctx.logger:
-            ctx.logger.debug(f"开始路由消息: '{ctx.text}', 来自: {ctx.sender_name}, 群聊: {ctx.is_group}, @机器人: {ctx.is_at_bot}")
+        if ctx.logger and ctx.logger.isEnabledFor(logging.DEBUG):
+            ctx.logger.debug("开始路由消息: '%s', 来自: %s, 群聊: %s, @机器人: %s", ctx.text, ctx.sender_name, ctx.is_group, ctx.is_at_bot)
+        
+        # 1. 按作用域和是否@机器人 (need_at 仅在群聊中有效) 选出候选命令
+        if not ctx.is_group:
+            candidates, prefilter = self._private_commands, self._private_prefilter
+        elif ctx.is_at_bot:
+            candidates, prefilter = self._group_at_commands, self._group_at_prefilter
+        else:
+            candidates, prefilter = self._group_commands, self._group_prefilter
         
-        # 遍历命令列表，按优先级顺序匹配
-        for cmd in self.commands:
-            # 1. 检查作用域 (scope)
-            if cmd.scope != "both":
-                if (cmd.scope == "group" and not ctx.is_group) or \
-                   (cmd.scope == "private" and ctx.is_group):
-                    continue  # 作用域不匹配，跳过
-            
-            # 2. 检查是否需要 @ (need_at) - 仅在群聊中有效
-            if ctx.is_group and cmd.need_at and not ctx.is_at_bot:
-                continue  # 需要@机器人但未被@，跳过
-            
-            # 3. 执行匹配逻辑
+        if prefilter is not None and not prefilter.search(ctx.text):
+            if ctx.logger:
+                ctx.logger.debug("消息不含任何命令关键字，跳过命令匹配")
+            return False
+        text_lower = ctx.text.lower()
+        
+        # 遍历候选命令，按优先级顺序匹配
+        for cmd in candidates:
+            # 消息不含该命令的任何关键字时，正则不可能匹配，直接跳过
+            if cmd.keywords and not any(kw in text_lower for kw in cmd.keywords):
+                continue
+            # 2. 执行匹配逻辑
             match_result = None
             try:
-                # 根据pattern类型执行匹配
-                if callable(cmd.pattern):
+                # 根据pattern类型执行匹配（类型在 Command 创建时已确定）
+                if cmd._is_regex:
+                    # 正则表达式匹配
+                    match_result = cmd._search(ctx.text)
+                else:
                     # 自定义匹配函数
                     match_result = cmd.pattern(ctx)
-                else:
-                    # 正则表达式匹配
-                    match_obj = cmd.pattern.search(ctx.text)
-                    match_result = match_obj
                 
                 # 匹配失败，尝试下一个命令
                 if match_result is None:
@@ -80,18 +115,18 @@ class CommandRouter:
                 
                 # 匹配成功，记录日志
                 if ctx.logger:
-                    ctx.logger.info(f"命令 '{cmd.name}' 匹配成功，准备处理")
+                    ctx.logger.info("命令 '%s' 匹配成功，准备处理", cmd.name)
                 
-                # 4. 执行命令处理函数
+                # 3. 执行命令处理函数
                 try:
                     result = cmd.handler(ctx, match_result)
                     if result:
                         if ctx.logger:
-                            ctx.logger.info(f"命令 '{cmd.name}' 处理成功")
+                            ctx.logger.info("命令 '%s' 处理成功", cmd.name)
                         return True
                     else:
                         if ctx.logger:
-                            ctx.logger.warning(f"命令 '{cmd.name}' 处理返回False，尝试下一个命令")
+                            ctx.logger.warning("命令 '%s' 处理返回False，尝试下一个命令", cmd.name)
                 except Exception as e:
                     if ctx.logger:
                         ctx.logger.error(f"执行命令 '{cmd.name}' 处理函数时出错: {e}")
@@ -1,29 +1,42 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import copy
 import logging.config
 import os
 import shutil
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import yaml
 
+# 优先使用 libyaml 的 C 实现解析，未编译 libyaml 时退回纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 最近一次解析结果，文件修改时间未变时 reload 直接复用，不再重新解析
+_config_cache: Optional[Tuple[int, dict]] = None  # (st_mtime_ns, 解析结果)
+
 
 class Config(object):
     def __init__(self) -> None:
         self.reload()
 
     def _load_config(self) -> dict:
+        global _config_cache
         pwd = os.path.dirname(os.path.abspath(__file__))
-        try:
-            with open(f"{pwd}/config.yaml", "rb") as fp:
-                yconfig = yaml.safe_load(fp)
-        except FileNotFoundError:
-            shutil.copyfile(f"{pwd}/config.yaml.template", f"{pwd}/config.yaml")
-            with open(f"{pwd}/config.yaml", "rb") as fp:
-                yconfig = yaml.safe_load(fp)
-
-        return yconfig
+        path = f"{pwd}/config.yaml"
+        if not os.path.exists(path):
+            shutil.copyfile(f"{pwd}/config.yaml.template", path)
+
+        mtime = os.stat(path).st_mtime_ns
+        if _config_cache is None or _config_cache[0] != mtime:
+            with open(path, "rb") as fp:
+                _config_cache = (mtime, yaml.load(fp, Loader=_YamlLoader))
+
+        # logging.config.dictConfig 会修改传入的字典，返回副本以免污染缓存
+        return copy.deepcopy(_config_cache[1])
 
     def reload(self) -> None:
         yconfig = self._load_config()
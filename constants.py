@@ -11,13 +11,13 @@ class ChatType(IntEnum):
 
     @staticmethod
     def is_in_chat_types(chat_type: int) -> bool:
-        if chat_type in [ChatType.CHATGPT.value,
-                        ChatType.DEEPSEEK.value,
-                        ChatType.PERPLEXITY.value,
-                        ChatType.GEMINI.value]:
-            return True
-        return False
+        return chat_type in _CHAT_TYPE_VALUES
 
     @staticmethod
     def help_hint() -> str:
-        return str({member.value: member.name for member in ChatType}).replace('{', '').replace('}', '')
+        return _CHAT_TYPE_HELP_HINT
+
+
+# 成员集合和帮助文本在类定义后计算一次（放在类体内会被 Enum 当作成员）
+_CHAT_TYPE_VALUES = frozenset(member.value for member in ChatType)
+_CHAT_TYPE_HELP_HINT = str({member.value: member.name for member in ChatType}).replace('{', '').replace('}', '')
@@ -4,8 +4,11 @@ import time
 import json
 import os
 import sqlite3
+import atexit
 from typing import List, Dict, Tuple, Optional, Any
+import threading
 from threading import Thread, Lock
+from functools import lru_cache
 
 # 获取 Logger 实例
 logger_duel = logging.getLogger("DuelRankSystem")
@@ -14,6 +17,12 @@ logger_duel = logging.getLogger("DuelRankSystem")
 class DuelRankSystem:
     # 使用线程锁确保数据库操作的线程安全
     _db_lock = Lock()
+    # 已切换为 WAL 日志模式的数据库文件；WAL 设置持久保存在文件中，每个文件只需设置一次
+    _wal_db_paths = set()
+    # 每个线程对每个数据库文件复用一个连接；已结束线程的连接在新建连接时回收，其余在进程退出时关闭
+    _tls = threading.local()
+    _all_conns: List[Tuple[Thread, sqlite3.Connection]] = []
+    _all_conns_lock = Lock()
     
     def __init__(self, group_id=None, db_path="data/message_history.db"):
         """
@@ -32,10 +41,53 @@ class DuelRankSystem:
         self._init_db()  # 初始化数据库
     
     def _get_db_conn(self) -> sqlite3.Connection:
-        """获取数据库连接"""
+        """
+        获取当前线程的数据库连接（首次调用时创建并缓存）。
+        调用方使用 `with conn:` 只会提交/回滚事务，不会关闭连接。
+        """
+        conns = getattr(DuelRankSystem._tls, "conns", None)
+        if conns is None:
+            conns = DuelRankSystem._tls.conns = {}
+        conn = conns.get(self.db_path)
+        if conn is None:
+            conn = conns[self.db_path] = self._open_db_conn()
+            with DuelRankSystem._all_conns_lock:
+                # 决斗等功能会为每次请求新开线程，顺带关闭已结束线程留下的连接
+                alive = []
+                for owner, owned_conn in DuelRankSystem._all_conns:
+                    if owner.is_alive():
+                        alive.append((owner, owned_conn))
+                    else:
+                        owned_conn.close()
+                alive.append((threading.current_thread(), conn))
+                DuelRankSystem._all_conns = alive
+        return conn
+
+    @classmethod
+    def close_all_connections(cls) -> None:
+        """关闭所有线程缓存的数据库连接（进程退出时调用）"""
+        with cls._all_conns_lock:
+            for _, conn in cls._all_conns:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            cls._all_conns.clear()
+
+    def _open_db_conn(self) -> sqlite3.Connection:
+        """新建数据库连接并设置连接参数"""
         try:
-            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            # timeout 即 busy_timeout：写锁被占用时最多等待 30 秒
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
             conn.row_factory = sqlite3.Row  # 让查询结果可以像字典一样访问列
+            if self.db_path not in DuelRankSystem._wal_db_paths:
+                # WAL 模式下读操作不会被写操作阻塞，提交时也少一次日志文件 fsync
+                conn.execute("PRAGMA journal_mode=WAL")
+                DuelRankSystem._wal_db_paths.add(self.db_path)
+            # 以下设置只对当前连接有效
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
             return conn
         except sqlite3.Error as e:
             logger_duel.error(f"无法连接到 SQLite 数据库 '{self.db_path}': {e}", exc_info=True)
@@ -149,6 +201,49 @@ class DuelRankSystem:
                 }
             }
     
+    # 决斗结算：胜者/败者不存在时以默认数据 (1000 分) 为基础直接插入，省去预先查询/创建玩家
+    _SQL_UPSERT_WINNER = """
+    INSERT INTO duel_players (group_id, player_name, score, wins, losses, total_matches, last_updated)
+    VALUES (?, ?, 1000 + ?, 1, 0, 1, datetime('now'))
+    ON CONFLICT(group_id, player_name) DO UPDATE SET
+    score = score + ?,
+    wins = wins + 1,
+    total_matches = total_matches + 1,
+    last_updated = datetime('now')
+    """
+    _SQL_UPSERT_LOSER = """
+    INSERT INTO duel_players (group_id, player_name, score, wins, losses, total_matches, last_updated)
+    VALUES (?, ?, MAX(1, 1000 - ?), 0, 1, 1, datetime('now'))
+    ON CONFLICT(group_id, player_name) DO UPDATE SET
+    score = MAX(1, score - ?),
+    losses = losses + 1,
+    total_matches = total_matches + 1,
+    last_updated = datetime('now')
+    """
+    # 道具 -> (使用者, 显示名)：老魔杖、隐身衣由胜者使用，魔法石由败者使用
+    _DUEL_ITEMS = {
+        "elder_wand": ("winner", "老魔杖"),
+        "magic_stone": ("loser", "魔法石"),
+        "invisibility_cloak": ("winner", "隐身衣"),
+    }
+
+    def _apply_duel(self, winner: str, loser: str, winner_points: int, loser_points: int, used_item: Optional[str] = None) -> None:
+        """在一个事务中更新胜者、败者积分并扣除道具，出错时抛出 sqlite3.Error 并回滚"""
+        with self._db_lock:
+            conn = self._get_db_conn()
+            with conn:
+                conn.execute(self._SQL_UPSERT_WINNER, (self.group_id, winner, winner_points, winner_points))
+                conn.execute(self._SQL_UPSERT_LOSER, (self.group_id, loser, loser_points, loser_points))
+                item = self._DUEL_ITEMS.get(used_item)
+                if item:
+                    # 列名来自固定的道具表，不是用户输入
+                    owner = winner if item[0] == "winner" else loser
+                    conn.execute(
+                        f"UPDATE duel_players SET {used_item} = MAX(0, {used_item} - 1) WHERE group_id = ? AND player_name = ?",
+                        (self.group_id, owner)
+                    )
+                    logger_duel.info(f"消耗了 {owner} 的{item[1]} (剩余数量将被更新)")
+
     def update_score(self, winner: str, loser: str, winner_hp: int, rounds: int) -> Tuple[int, int]:
         """更新玩家积分
         
@@ -161,10 +256,6 @@ class DuelRankSystem:
         Returns:
             Tuple[int, int]: (胜利者获得积分, 失败者失去积分)
         """
-        # 获取玩家数据
-        winner_data = self.get_player_data(winner)
-        loser_data = self.get_player_data(loser)
-        
         # 基础积分计算 - 回合数越少积分越高
         base_points = 100
         if rounds <= 5:  # 速战速决
@@ -179,38 +270,10 @@ class DuelRankSystem:
         points = int(base_points * (hp_percent_bonus))  # 血量越多，积分越高
         
         try:
-            with self._db_lock:
-                with self._get_db_conn() as conn:
-                    cursor = conn.cursor()
-                    
-                    # 更新胜利者数据
-                    sql_update_winner = """
-                    UPDATE duel_players SET 
-                    score = score + ?,
-                    wins = wins + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_winner, (points, self.group_id, winner))
-                    
-                    # 更新失败者数据
-                    sql_update_loser = """
-                    UPDATE duel_players SET 
-                    score = MAX(1, score - ?),
-                    losses = losses + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_loser, (points, self.group_id, loser))
-                    
-                    # 移除了记录对战历史的代码
-                    
-                    conn.commit()
-                    logger_duel.info(f"{winner} 击败 {loser}，获得 {points} 积分")
-                    
-                    return (points, points)  # 返回胜者得分和败者失分（相同）
+            # 玩家不存在时由 UPSERT 自动创建
+            self._apply_duel(winner, loser, points, points)
+            logger_duel.info(f"{winner} 击败 {loser}，获得 {points} 积分")
+            return (points, points)  # 返回胜者得分和败者失分（相同）
                     
         except sqlite3.Error as e:
             logger_duel.error(f"更新积分失败: {e}", exc_info=True)
@@ -226,43 +289,43 @@ class DuelRankSystem:
             List[Dict]: 排行榜数据
         """
         try:
-            with self._db_lock:
-                with self._get_db_conn() as conn:
-                    cursor = conn.cursor()
-                    sql_query = """
-                    SELECT player_name, score, wins, losses, total_matches,
-                           elder_wand, magic_stone, invisibility_cloak
-                    FROM duel_players
-                    WHERE group_id = ?
-                    ORDER BY score DESC
-                    LIMIT ?
-                    """
-                    cursor.execute(sql_query, (self.group_id, top_n))
-                    results = cursor.fetchall()
+            # 只读查询，WAL 模式下可与写操作并发，无需持有写锁
+            with self._get_db_conn() as conn:
+                cursor = conn.cursor()
+                sql_query = """
+                SELECT player_name, score, wins, losses, total_matches,
+                       elder_wand, magic_stone, invisibility_cloak
+                FROM duel_players
+                WHERE group_id = ?
+                ORDER BY score DESC
+                LIMIT ?
+                """
+                cursor.execute(sql_query, (self.group_id, top_n))
+                results = cursor.fetchall()
+                
+                # 转换结果为字典列表，格式与原JSON格式相同
+                ranked_players = []
+                for row in results:
+                    player_dict = dict(row)
+                    player_name = player_dict.pop("player_name")
                     
-                    # 转换结果为字典列表，格式与原JSON格式相同
-                    ranked_players = []
-                    for row in results:
-                        player_dict = dict(row)
-                        player_name = player_dict.pop("player_name")
-                        
-                        # 构造与原格式相同的字典
-                        player = {
-                            "name": player_name,
-                            "score": player_dict["score"],
-                            "wins": player_dict["wins"],
-                            "losses": player_dict["losses"],
-                            "total_matches": player_dict["total_matches"],
-                            "items": {
-                                "elder_wand": player_dict["elder_wand"],
-                                "magic_stone": player_dict["magic_stone"],
-                                "invisibility_cloak": player_dict["invisibility_cloak"]
-                            }
+                    # 构造与原格式相同的字典
+                    player = {
+                        "name": player_name,
+                        "score": player_dict["score"],
+                        "wins": player_dict["wins"],
+                        "losses": player_dict["losses"],
+                        "total_matches": player_dict["total_matches"],
+                        "items": {
+                            "elder_wand": player_dict["elder_wand"],
+                            "magic_stone": player_dict["magic_stone"],
+                            "invisibility_cloak": player_dict["invisibility_cloak"]
                         }
-                        ranked_players.append(player)
-                    
-                    return ranked_players
-                    
+                    }
+                    ranked_players.append(player)
+                
+                return ranked_players
+                
         except sqlite3.Error as e:
             logger_duel.error(f"获取排行榜失败: {e}", exc_info=True)
             return []  # 出错时返回空列表
@@ -280,29 +343,29 @@ class DuelRankSystem:
         player_data = self.get_player_data(player_name)
         
         try:
-            with self._db_lock:
-                with self._get_db_conn() as conn:
-                    cursor = conn.cursor()
-                    
-                    # 查询排行榜中有哪些分数比该玩家高
-                    sql_rank = """
-                    SELECT COUNT(*) + 1 as rank
-                    FROM duel_players
-                    WHERE group_id = ? AND score > (
-                        SELECT score FROM duel_players
-                        WHERE group_id = ? AND player_name = ?
-                    )
-                    """
-                    cursor.execute(sql_rank, (self.group_id, self.group_id, player_name))
-                    result = cursor.fetchone()
+            # 只读查询，WAL 模式下可与写操作并发，无需持有写锁
+            with self._get_db_conn() as conn:
+                cursor = conn.cursor()
+                
+                # 查询排行榜中有哪些分数比该玩家高
+                sql_rank = """
+                SELECT COUNT(*) + 1 as rank
+                FROM duel_players
+                WHERE group_id = ? AND score > (
+                    SELECT score FROM duel_players
+                    WHERE group_id = ? AND player_name = ?
+                )
+                """
+                cursor.execute(sql_rank, (self.group_id, self.group_id, player_name))
+                result = cursor.fetchone()
+                
+                if result:
+                    rank = result["rank"]
+                    return rank, player_data
+                else:
+                    # 找不到玩家排名，可能是新玩家
+                    return None, player_data
                     
-                    if result:
-                        rank = result["rank"]
-                        return rank, player_data
-                    else:
-                        # 找不到玩家排名，可能是新玩家
-                        return None, player_data
-                        
         except sqlite3.Error as e:
             logger_duel.error(f"获取玩家排名失败: {e}", exc_info=True)
             return None, player_data  # 出错时返回None作为排名
@@ -375,46 +438,14 @@ class DuelRankSystem:
         Returns:
             Tuple[int, int]: (胜利者获得积分, 失败者失去积分)
         """
-        # 获取玩家数据 (这里只是为了确保玩家存在)
-        self.get_player_data(winner)
-        self.get_player_data(loser)
-        
         # 使用魔法总分作为积分变化值
         points = magic_power
         
         try:
-            with self._db_lock:
-                with self._get_db_conn() as conn:
-                    cursor = conn.cursor()
-                    
-                    # 更新胜利者数据
-                    sql_update_winner = """
-                    UPDATE duel_players SET 
-                    score = score + ?,
-                    wins = wins + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_winner, (points, self.group_id, winner))
-                    
-                    # 更新失败者数据
-                    sql_update_loser = """
-                    UPDATE duel_players SET 
-                    score = MAX(1, score - ?),
-                    losses = losses + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_loser, (points, self.group_id, loser))
-                    
-                    # 移除了记录对战历史的代码
-                    
-                    conn.commit()
-                    logger_duel.info(f"{winner} 使用魔法击败 {loser}，获得 {points} 积分")
-                    
-                    return (points, points)  # 返回胜者得分和败者失分（相同）
+            # 玩家不存在时由 UPSERT 自动创建
+            self._apply_duel(winner, loser, points, points)
+            logger_duel.info(f"{winner} 使用魔法击败 {loser}，获得 {points} 积分")
+            return (points, points)  # 返回胜者得分和败者失分（相同）
                     
         except sqlite3.Error as e:
             logger_duel.error(f"根据魔法分数更新积分失败: {e}", exc_info=True)
@@ -435,60 +466,13 @@ class DuelRankSystem:
         Returns:
             Tuple[int, int]: (胜利者实际获得积分, 失败者实际失去积分)
         """
-        # 获取玩家数据 (确保玩家存在)
-        self.get_player_data(winner)
-        self.get_player_data(loser)
-        
         # 注意：loser_points 是正数，表示要扣除的分数
         
         try:
-            with self._db_lock:
-                with self._get_db_conn() as conn:
-                    cursor = conn.cursor()
-                    
-                    # 更新胜利者数据
-                    sql_update_winner = """
-                    UPDATE duel_players SET 
-                    score = score + ?,
-                    wins = wins + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_winner, (winner_points, self.group_id, winner))
-                    
-                    # 更新失败者数据
-                    sql_update_loser = """
-                    UPDATE duel_players SET 
-                    score = MAX(1, score - ?),
-                    losses = losses + 1,
-                    total_matches = total_matches + 1,
-                    last_updated = datetime('now')
-                    WHERE group_id = ? AND player_name = ?
-                    """
-                    cursor.execute(sql_update_loser, (loser_points, self.group_id, loser))
-
-                    # --- 改进处理道具消耗逻辑 ---
-                    if used_item == "elder_wand":
-                        # 老魔杖是胜利者使用的
-                        cursor.execute("UPDATE duel_players SET elder_wand = MAX(0, elder_wand - 1) WHERE group_id = ? AND player_name = ?", (self.group_id, winner))
-                        logger_duel.info(f"消耗了 {winner} 的老魔杖 (剩余数量将被更新)")
-                    elif used_item == "magic_stone":
-                        # 魔法石是失败者使用的
-                        cursor.execute("UPDATE duel_players SET magic_stone = MAX(0, magic_stone - 1) WHERE group_id = ? AND player_name = ?", (self.group_id, loser))
-                        logger_duel.info(f"消耗了 {loser} 的魔法石 (剩余数量将被更新)")
-                    elif used_item == "invisibility_cloak":
-                        # 隐身衣由胜利者使用
-                        cursor.execute("UPDATE duel_players SET invisibility_cloak = MAX(0, invisibility_cloak - 1) WHERE group_id = ? AND player_name = ?", (self.group_id, winner))
-                        logger_duel.info(f"消耗了 {winner} 的隐身衣 (剩余数量将被更新)")
-                    # --------------------------
-
-                    # 移除了记录对战历史的代码
-                    
-                    conn.commit()
-                    logger_duel.info(f"{winner} 在决斗中击败 {loser}，胜者积分 +{winner_points}，败者积分 -{loser_points}，使用道具: {used_item or '无'}")
-                    
-                    return (winner_points, loser_points)  # 返回实际积分变化
+            # 胜负双方积分与道具消耗在同一事务中完成，玩家不存在时由 UPSERT 自动创建
+            self._apply_duel(winner, loser, winner_points, loser_points, used_item)
+            logger_duel.info(f"{winner} 在决斗中击败 {loser}，胜者积分 +{winner_points}，败者积分 -{loser_points}，使用道具: {used_item or '无'}")
+            return (winner_points, loser_points)  # 返回实际积分变化
                     
         except sqlite3.Error as e:
             logger_duel.error(f"记录决斗结果失败: {e}", exc_info=True)
@@ -497,6 +481,17 @@ class DuelRankSystem:
             logger_duel.error(f"记录决斗结果时发生未知错误: {e}", exc_info=True)
             return (0, 0)  # 出错时返回0分
 
+atexit.register(DuelRankSystem.close_all_connections)
+
+@lru_cache(maxsize=128)
+def get_rank_system(group_id) -> DuelRankSystem:
+    """
+    获取群组对应的排位系统实例（按群缓存）。
+    实例本身不保存玩家数据，数据都在 SQLite 中，复用实例只是省去每次命令都执行的建表检查。
+    """
+    return DuelRankSystem(group_id)
+
+
 class HarryPotterDuel:
     """决斗功能"""
     
@@ -616,12 +611,12 @@ class HarryPotterDuel:
     def start_duel(self):
         """开始决斗，返回决斗过程的步骤列表"""
         # 创建积分系统实例，整个方法中重用
-        rank_system = DuelRankSystem(self.group_id)
+        rank_system = get_rank_system(self.group_id)
         
-        # --- 修改：提前获取双方玩家数据 ---
+        # 提前获取挑战者数据（不存在时会创建记录，Boss战结算依赖该记录）
         player1_data = rank_system.get_player_data(self.player1["name"])
-        player2_data = rank_system.get_player_data(self.player2["name"])
-        # ---------------------------------------------
+        # Boss战不需要对手数据，也不应为Boss在排行榜中创建记录
+        player2_data = None if self.is_boss_fight else rank_system.get_player_data(self.player2["name"])
         
         # Boss战特殊处理
         if self.is_boss_fight:
@@ -720,6 +715,8 @@ class HarryPotterDuel:
                             else:
                                 # 玩家不存在，这种情况理论上不可能发生，但为安全添加
                                 logger_duel.error(f"Boss战获胜但找不到玩家 {winner['name']} 数据")
+                                self.steps.append(f"⚠️ 处理战利品时遇到问题: 找不到玩家 {winner['name']} 的数据")
+                                return self.steps
                 except sqlite3.Error as e:
                     logger_duel.error(f"处理Boss战胜利时出错: {e}", exc_info=True)
                     self.steps.append(f"⚠️ 处理战利品时遇到问题: {e}")
@@ -1096,7 +1093,7 @@ def get_rank_list(top_n: int = 10, group_id=None) -> str:
         return "❌ 决斗排行榜功能只支持群聊"
         
     try:
-        rank_system = DuelRankSystem(group_id)
+        rank_system = get_rank_system(group_id)
         ranks = rank_system.get_rank_list(top_n)
         
         if not ranks:
@@ -1125,7 +1122,7 @@ def get_player_stats(player_name: str, group_id=None) -> str:
         return "❌ 决斗战绩查询功能只支持群聊"
         
     try:
-        rank_system = DuelRankSystem(group_id)
+        rank_system = get_rank_system(group_id)
         rank, player_data = rank_system.get_player_rank(player_name)
         
         win_rate = int((player_data["wins"] / player_data["total_matches"]) * 100) if player_data["total_matches"] > 0 else 0
@@ -1161,7 +1158,7 @@ def change_player_name(old_name: str, new_name: str, group_id=None) -> str:
         return "❌ 更改玩家名称功能只支持群聊"
         
     try:
-        rank_system = DuelRankSystem(group_id)
+        rank_system = get_rank_system(group_id)
         result = rank_system.change_player_name(old_name, new_name)
         
         if result:
@@ -1322,7 +1319,7 @@ def attempt_sneak_attack(attacker_name: str, target_name: str, group_id: str) ->
         return "❌ 偷袭功能也只支持群聊哦。"
 
     try:
-        rank_system = DuelRankSystem(group_id)
+        rank_system = get_rank_system(group_id)
 
         # 检查玩家是否存在
         with rank_system._db_lock:
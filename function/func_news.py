@@ -1,20 +1,79 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import atexit
 import json
+import os
 import re
 import logging
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import Future
+from datetime import datetime, date
 
 import requests
 from lxml import etree
 
+# 新闻按天缓存：同一天内所有请求共用一次抓取结果（缓存文件固定在项目目录下）
+NEWS_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "news_cache.json")
+# 旧闻（当天新闻尚未发布）的缓存有效期（秒），过期后重新抓取
+NEWS_STALE_TTL = 30 * 60
+# 抓取新闻接口的超时时间（秒）
+NEWS_REQUEST_TIMEOUT = 10
+
+_NEWS_CACHE = {}  # 日期字符串 -> (写入时间, is_today, news_content)
+_NEWS_INFLIGHT = {}  # 日期字符串 -> 正在进行的抓取 Future
+_NEWS_LOCK = threading.Lock()
+_news_cache_loaded = False  # 磁盘缓存在首次获取新闻时才加载
+
+# datetime.weekday() 下标 -> 星期显示文本
+_WEEKDAYS = ("周一", "周二", "周三", "周四", "周五", "周六", "周日")
+
+
+def _load_news_cache() -> None:
+    """从磁盘恢复当天的新闻缓存（调用方需持有 _NEWS_LOCK）"""
+    try:
+        with open(NEWS_CACHE_PATH, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        today = date.today().isoformat()
+        if today in entries:
+            stored_at, is_today, content = entries[today]
+            _NEWS_CACHE[today] = (stored_at, bool(is_today), content)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"加载新闻缓存失败: {e}")
+
+
+def _save_news_cache() -> None:
+    """进程退出时把当天的新闻缓存写入磁盘"""
+    today = date.today().isoformat()
+    with _NEWS_LOCK:
+        entry = _NEWS_CACHE.get(today)
+    if entry is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(NEWS_CACHE_PATH), exist_ok=True)
+        with open(NEWS_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump({today: list(entry)}, f, ensure_ascii=False)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"保存新闻缓存失败: {e}")
+
+
+def _ensure_news_cache_loaded() -> None:
+    """首次使用时加载磁盘缓存，并注册进程退出时的保存（调用方需持有 _NEWS_LOCK）"""
+    global _news_cache_loaded
+    if _news_cache_loaded:
+        return
+    _news_cache_loaded = True
+    _load_news_cache()
+    atexit.register(_save_news_cache)
+
 
 class News(object):
     def __init__(self) -> None:
         self.LOG = logging.getLogger(__name__)
-        self.week = {0: "周一", 1: "周二", 2: "周三", 3: "周四", 4: "周五", 5: "周六", 6: "周日"}
+        self.week = _WEEKDAYS
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/110.0"}
 
@@ -24,12 +83,52 @@ class News(object):
         返回一个元组 (is_today, news_content)。
         is_today: 布尔值，True表示是当天新闻，False表示是旧闻或获取失败。
         news_content: 格式化后的新闻字符串，或在失败时为空字符串。
+
+        当天新闻在当天内一直复用缓存；旧闻只缓存 NEWS_STALE_TTL 秒；获取失败不缓存。
+        并发请求只由第一个发起网络请求，其余等待并共享同一结果。
         """
+        key = date.today().isoformat()
+        with _NEWS_LOCK:
+            _ensure_news_cache_loaded()
+            entry = _NEWS_CACHE.get(key)
+            if entry is not None:
+                stored_at, is_today, content = entry
+                if is_today or time.time() - stored_at < NEWS_STALE_TTL:
+                    return (is_today, content)
+            future = _NEWS_INFLIGHT.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                _NEWS_INFLIGHT[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = self._fetch_important_news()
+        except Exception as e:
+            with _NEWS_LOCK:
+                _NEWS_INFLIGHT.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        is_today, content = result
+        with _NEWS_LOCK:
+            _NEWS_INFLIGHT.pop(key, None)
+            if content:
+                # 只保留当天的条目，避免缓存跨天增长
+                _NEWS_CACHE.clear()
+                _NEWS_CACHE[key] = (time.time(), is_today, content)
+        future.set_result(result)
+        return result
+
+    def _fetch_important_news(self):
+        """从财联社接口抓取重要新闻，返回值同 get_important_news"""
         url = "https://www.cls.cn/api/sw?app=CailianpressWeb&os=web&sv=7.7.5"
         data = {"type": "telegram", "keyword": "你需要知道的隔夜全球要闻", "page": 0,
                 "rn": 1, "os": "web", "sv": "7.7.5", "app": "CailianpressWeb"}
         try:
-            rsp = requests.post(url=url, headers=self.headers, data=data)
+            rsp = requests.post(url=url, headers=self.headers, data=data, timeout=NEWS_REQUEST_TIMEOUT)
             data = json.loads(rsp.text)["data"]["telegram"]["data"][0]
             news = data["descr"]
             timestamp = data["time"]
@@ -7,7 +7,7 @@ import schedule
 from datetime import datetime, timedelta
 import logging
 import threading
-from typing import Optional, Dict, Tuple  # 添加类型提示导入
+from typing import Optional, Dict, Tuple, List  # 添加类型提示导入
 
 # 获取 Logger 实例
 logger = logging.getLogger("ReminderManager")
@@ -25,6 +25,8 @@ class ReminderManager:
         """
         self.robot = robot
         self.db_path = db_path
+        # 数据版本号，每次增删改提醒后递增，供调用方按 (用户, 版本) 缓存派生数据
+        self.version = 0
         self._create_table() # 初始化时确保表存在
 
         # 注册周期性检查任务
@@ -93,22 +95,22 @@ class ReminderManager:
                     cursor.execute(index_sql_type)
                     cursor.execute(index_sql_roomid)
                     conn.commit()
+                    self.version += 1
             logger.info("数据库表 'reminders' 检查/创建 完成。")
         except sqlite3.Error as e:
             logger.error(f"创建/检查数据库表 'reminders' 失败: {e}", exc_info=True)
 
     # --- 对外接口 ---
-    def add_reminder(self, wxid: str, data: dict, roomid: Optional[str] = None) -> Tuple[bool, str]:
-        """
-        将解析后的提醒数据添加到数据库。
-        :param wxid: 用户的微信 ID。
-        :param data: 包含 type, time, content 的字典。
-        :param roomid: 群聊ID，如果在群聊中设置提醒则不为空
-        :return: (是否成功, 提醒 ID 或 错误信息)
+    _INSERT_SQL = """
+        INSERT INTO reminders (id, wxid, type, time_str, content, created_at, last_triggered_at, weekday, roomid)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
-        reminder_id = str(uuid.uuid4())
-        created_at_iso = datetime.now().isoformat()
 
+    def _build_reminder_row(self, wxid: str, data: dict, roomid: Optional[str] = None) -> Tuple[bool, object]:
+        """
+        校验提醒数据并构造待插入的行。
+        :return: (是否校验通过, 插入参数元组 或 错误信息)
+        """
         # 校验数据 (基本)
         required_keys = {"type", "time", "content"}
         if not required_keys.issubset(data.keys()):
@@ -134,29 +136,39 @@ class ReminderManager:
         except ValueError as e:
              return False, f"时间格式错误 ({data['time']})，需要 'YYYY-MM-DD HH:MM' (once) 或 'HH:MM' (daily/weekly): {e}"
 
-        # 准备插入数据库
-        sql = """
-        INSERT INTO reminders (id, wxid, type, time_str, content, created_at, last_triggered_at, weekday, roomid)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
         params = (
-            reminder_id,
+            str(uuid.uuid4()),
             wxid,
             data["type"],
             data["time"],
             data["content"],
-            created_at_iso,
+            datetime.now().isoformat(),
             None, # last_triggered_at 初始为 NULL
             weekday_val, # weekday 字段
             roomid  # 新增：roomid 参数
         )
+        return True, params
+
+    def add_reminder(self, wxid: str, data: dict, roomid: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        将解析后的提醒数据添加到数据库。
+        :param wxid: 用户的微信 ID。
+        :param data: 包含 type, time, content 的字典。
+        :param roomid: 群聊ID，如果在群聊中设置提醒则不为空
+        :return: (是否成功, 提醒 ID 或 错误信息)
+        """
+        ok, params_or_err = self._build_reminder_row(wxid, data, roomid)
+        if not ok:
+            return False, params_or_err
+        reminder_id = params_or_err[0]
 
         try:
             with self._db_lock: # 加锁
                 with self._get_db_conn() as conn:
                     cursor = conn.cursor()
-                    cursor.execute(sql, params)
+                    cursor.execute(self._INSERT_SQL, params_or_err)
                     conn.commit()
+                    self.version += 1
             # 记录日志时包含群聊信息
             log_target = f"用户 {wxid}" + (f" 在群聊 {roomid}" if roomid else "")
             logger.info(f"成功添加提醒 {reminder_id} for {log_target} 到数据库。")
@@ -168,6 +180,42 @@ class ReminderManager:
             logger.error(f"添加提醒到数据库失败: {e}", exc_info=True)
             return False, f"数据库错误: {e}"
 
+    def add_reminders_batch(self, wxid: str, reminders: List[dict], roomid: Optional[str] = None) -> List[Tuple[bool, str]]:
+        """
+        批量添加提醒，所有校验通过的提醒在同一个事务中插入。
+        :param wxid: 用户的微信 ID。
+        :param reminders: 提醒数据字典列表，格式同 add_reminder 的 data。
+        :param roomid: 群聊ID，如果在群聊中设置提醒则不为空
+        :return: 与 reminders 一一对应的 (是否成功, 提醒 ID 或 错误信息) 列表
+        """
+        results: List[Tuple[bool, str]] = []
+        rows = []
+        for data in reminders:
+            ok, params_or_err = self._build_reminder_row(wxid, data, roomid)
+            if ok:
+                rows.append(params_or_err)
+                results.append((True, params_or_err[0]))
+            else:
+                results.append((False, params_or_err))
+
+        if not rows:
+            return results
+
+        try:
+            with self._db_lock: # 加锁
+                with self._get_db_conn() as conn:
+                    conn.executemany(self._INSERT_SQL, rows)
+                    conn.commit()
+                    self.version += 1
+            log_target = f"用户 {wxid}" + (f" 在群聊 {roomid}" if roomid else "")
+            logger.info(f"成功批量添加 {len(rows)} 个提醒 for {log_target} 到数据库。")
+            return results
+        except sqlite3.Error as e:
+            # 事务整体回滚，所有待插入的提醒均视为失败
+            logger.error(f"批量添加提醒到数据库失败: {e}", exc_info=True)
+            error_msg = f"数据库错误: {e}"
+            return [(False, error_msg) if ok else (ok, msg) for ok, msg in results]
+
     # --- 核心检查逻辑 ---
     def check_and_trigger_reminders(self):
         """由 schedule 定期调用。检查数据库，触发到期的提醒。"""
@@ -265,6 +313,7 @@ class ReminderManager:
                     # 提交事务
                     if reminders_to_delete or reminders_to_update:
                         conn.commit()
+                        self.version += 1
 
         except sqlite3.Error as e:
             logger.error(f"检查并触发提醒时数据库出错: {e}", exc_info=True)
@@ -350,6 +399,7 @@ class ReminderManager:
                     sql_delete = "DELETE FROM reminders WHERE id = ? AND wxid = ?"
                     cursor.execute(sql_delete, (reminder_id, wxid))
                     conn.commit()
+                    self.version += 1
                     
                     # 在日志中记录位置信息
                     location_info = f"在群聊 {roomid}" if roomid else "在私聊"
@@ -363,6 +413,52 @@ class ReminderManager:
             logger.error(f"用户 {wxid} 删除提醒 {reminder_id} 时发生意外错误: {e}", exc_info=True)
             return False, f"删除提醒时发生未知错误: {e}"
 
+    def delete_reminders_batch(self, wxid: str, reminder_ids: List[str]) -> List[Tuple[bool, str]]:
+        """
+        批量删除用户的多个提醒，只加一次锁并在同一个事务中完成。
+        :param wxid: 用户的微信ID
+        :param reminder_ids: 要删除的提醒 ID 列表
+        :return: 与 reminder_ids 一一对应的 (是否成功, 消息) 列表，消息内容同 delete_reminder
+        """
+        if not reminder_ids:
+            return []
+        try:
+            with self._db_lock:
+                with self._get_db_conn() as conn:
+                    cursor = conn.cursor()
+                    # 一次查出这些 ID 中属于该用户的提醒
+                    unique_ids = list(dict.fromkeys(reminder_ids))
+                    placeholders = ",".join("?" * len(unique_ids))
+                    sql_check = f"SELECT id, roomid FROM reminders WHERE wxid = ? AND id IN ({placeholders})"
+                    cursor.execute(sql_check, (wxid, *unique_ids))
+                    owned = {row["id"]: row["roomid"] for row in cursor.fetchall()}
+
+                    if owned:
+                        sql_delete = "DELETE FROM reminders WHERE id = ? AND wxid = ?"
+                        cursor.executemany(sql_delete, [(rid, wxid) for rid in owned])
+                        conn.commit()
+                        self.version += 1
+
+            results: List[Tuple[bool, str]] = []
+            deleted = set()
+            for reminder_id in reminder_ids:
+                if reminder_id in owned and reminder_id not in deleted:
+                    deleted.add(reminder_id)
+                    location_info = f"在群聊 {owned[reminder_id]}" if owned[reminder_id] else "在私聊"
+                    logger.info(f"用户 {wxid} 成功删除了{location_info}设置的提醒 {reminder_id}")
+                    results.append((True, f"已成功删除提醒 (ID: {reminder_id[:6]}...)"))
+                else:
+                    logger.warning(f"用户 {wxid} 尝试删除不存在或不属于自己的提醒 {reminder_id}")
+                    results.append((False, f"未找到 ID 为 {reminder_id[:6]}... 的提醒，或该提醒不属于您。"))
+            return results
+
+        except sqlite3.Error as e:
+            logger.error(f"用户 {wxid} 批量删除提醒时数据库出错: {e}", exc_info=True)
+            return [(False, f"删除提醒时发生数据库错误: {e}")] * len(reminder_ids)
+        except Exception as e:
+            logger.error(f"用户 {wxid} 批量删除提醒时发生意外错误: {e}", exc_info=True)
+            return [(False, f"删除提醒时发生未知错误: {e}")] * len(reminder_ids)
+
     def delete_all_reminders(self, wxid: str) -> Tuple[bool, str, int]:
         """
         删除用户的所有提醒（包括群聊和私聊中设置的）。
@@ -386,6 +482,7 @@ class ReminderManager:
                     delete_sql = "DELETE FROM reminders WHERE wxid = ?"
                     cursor.execute(delete_sql, (wxid,))
                     conn.commit()
+                    self.version += 1
                     
                     logger.info(f"用户 {wxid} 删除了其所有 {count} 条提醒")
                     return True, f"已成功删除您的所有提醒（共 {count} 条）。", count
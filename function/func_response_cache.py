@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# 获取 Logger 实例
+logger = logging.getLogger("ResponseCache")
+
+# 归一化时合并连续空白
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class ResponseCache:
+    """
+    闲聊回复缓存。
+    以 (接收者, 发送者, 归一化后的消息内容) 的 sha1 作为键精确匹配，
+    相同会话中重复的问题可直接复用回复，省去一次 LLM 调用。
+    缓存按 LRU 淘汰，条目超过 ttl 秒后失效。
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 600):
+        """
+        :param max_size: 最多缓存的条目数
+        :param ttl: 条目有效期（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (写入时间, 回复)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(receiver: str, sender_name: str, content: str) -> str:
+        normalized = _WHITESPACE_RE.sub(" ", content.strip()).lower()
+        raw = f"{receiver}\x00{sender_name}\x00{normalized}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, receiver: str, sender_name: str, content: str) -> Optional[str]:
+        """查询缓存，未命中或已过期返回 None"""
+        key = self._make_key(receiver, sender_name, content)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        logger.debug("命中闲聊回复缓存: %s", receiver)
+        return response
+
+    def set(self, receiver: str, sender_name: str, content: str, response: str) -> None:
+        """写入缓存"""
+        if not response:
+            return
+        key = self._make_key(receiver, sender_name, content)
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -4,12 +4,16 @@ import logging
 import time
 import re
 from collections import deque
-# from threading import Lock  # 不再需要锁，使用SQLite的事务机制
+from threading import Lock  # 仅用于总结请求的合并与缓存，数据库操作仍使用SQLite的事务机制
+from concurrent.futures import Future
 import sqlite3  # 添加sqlite3模块
 import os  # 用于处理文件路径
 from function.func_xml_process import XmlProcessor  # 导入XmlProcessor
 # from commands.registry import COMMANDS # 不再需要导入命令列表
 
+# 总结结果的缓存时间（秒），短时间内重复请求总结时直接返回缓存结果
+SUMMARY_CACHE_TTL = 60
+
 class MessageSummary:
     """消息总结功能类 (使用SQLite持久化)
     用于记录、管理和生成聊天历史消息的总结
@@ -29,6 +33,11 @@ class MessageSummary:
         # 实例化XML处理器用于提取引用消息
         self.xml_processor = XmlProcessor(self.LOG)
 
+        # 正在生成中的总结 (chat_id -> Future) 与最近生成的总结 (chat_id -> (时间戳, 总结))
+        self._summary_lock = Lock()
+        self._summary_inflight = {}
+        self._summary_cache = {}
+
         try:
             db_dir = os.path.dirname(self.db_path)
             if db_dir and not os.path.exists(db_dir):
@@ -163,6 +172,9 @@ class MessageSummary:
             self.cursor.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
             rows_deleted = self.cursor.rowcount
             self.conn.commit()
+            # 历史已清空，缓存的总结随之失效
+            with self._summary_lock:
+                self._summary_cache.pop(chat_id, None)
             self.LOG.info(f"为 chat_id={chat_id} 清除了 {rows_deleted} 条历史消息")
             return True
 
@@ -292,6 +304,8 @@ class MessageSummary:
 
     def summarize_messages(self, chat_id, chat_model=None):
         """生成消息总结
+        同一聊天并发的总结请求只生成一次，等待者共享同一结果；
+        SUMMARY_CACHE_TTL 秒内的重复请求直接返回缓存。
 
         Args:
             chat_id: 聊天ID（群ID或用户ID）
@@ -300,6 +314,37 @@ class MessageSummary:
         Returns:
             str: 消息总结
         """
+        with self._summary_lock:
+            cached = self._summary_cache.get(chat_id)
+            if cached and time.time() - cached[0] < SUMMARY_CACHE_TTL:
+                self.LOG.info(f"chat_id={chat_id} 使用缓存的总结结果")
+                return cached[1]
+            future = self._summary_inflight.get(chat_id)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._summary_inflight[chat_id] = future
+
+        if not is_owner:
+            self.LOG.info(f"chat_id={chat_id} 的总结正在生成中，等待其结果")
+            return future.result()
+
+        try:
+            summary = self._summarize_messages_uncached(chat_id, chat_model)
+        except Exception as e:
+            with self._summary_lock:
+                self._summary_inflight.pop(chat_id, None)
+            future.set_exception(e)
+            raise
+
+        with self._summary_lock:
+            self._summary_inflight.pop(chat_id, None)
+            self._summary_cache[chat_id] = (time.time(), summary)
+        future.set_result(summary)
+        return summary
+
+    def _summarize_messages_uncached(self, chat_id, chat_model=None):
+        """实际生成消息总结（不经过合并与缓存）"""
         messages = self.get_messages(chat_id)
         if not messages:
             return "没有可以总结的历史消息。"
@@ -450,12 +495,17 @@ class MessageSummary:
 
         # 如果最终没有提取到有效内容，则不记录 (逻辑不变)
         if not content_to_record:
-            self.LOG.debug(f"未能提取到有效文本内容用于记录，跳过 (msg.id={msg.id}, type={msg.type}) - IsCard: {extracted_data.get('is_card', False)}, HasQuote: {extracted_data.get('has_quote', False)}")
+            if self.LOG.isEnabledFor(logging.DEBUG):
+                self.LOG.debug("未能提取到有效文本内容用于记录，跳过 (msg.id=%s, type=%s) - IsCard: %s, HasQuote: %s",
+                               msg.id, msg.type, extracted_data.get('is_card', False), extracted_data.get('has_quote', False))
             return
 
         # 获取当前时间字符串 (使用完整格式)
         current_time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
-        self.LOG.debug(f"记录消息 (来源: {source_info}, 类型: {'群聊' if msg.from_group() else '私聊'}): '[{current_time_str}]{sender_name}({sender_wxid}): {content_to_record}' (来自 msg.id={msg.id})")
+        if self.LOG.isEnabledFor(logging.DEBUG):
+            self.LOG.debug("记录消息 (来源: %s, 类型: %s): '[%s]%s(%s): %s' (来自 msg.id=%s)",
+                           source_info, '群聊' if msg.from_group() else '私聊', current_time_str,
+                           sender_name, sender_wxid, content_to_record, msg.id)
         # 调用 record_message 时传入 sender_wxid
         self.record_message(chat_id, sender_name, sender_wxid, content_to_record, current_time_str)
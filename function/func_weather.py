@@ -1,6 +1,18 @@
 import requests, json
 import logging
 import re  # 导入正则表达式模块，用于提取数字
+import threading
+import time
+from typing import Dict, Tuple
+
+# 天气数据更新不频繁，同一城市在该时间（秒）内的查询直接复用上次结果
+WEATHER_CACHE_TTL = 300
+
+_weather_cache: Dict[Tuple[str, bool], Tuple[float, str]] = {}  # (城市代码, 是否含预报) -> (写入时间, 天气文本)
+_weather_cache_lock = threading.Lock()
+
+# 从 "高温 28℃" 之类的字符串中提取温度数值
+_TEMP_RE = re.compile(r"(\d+(?:\.\d+)?)")
 
 class Weather:
     def __init__(self, city_code: str) -> None:
@@ -12,12 +24,28 @@ class Weather:
         if not temp_str:
             return ""
         # 匹配温度数字部分
-        match = re.search(r"(\d+(?:\.\d+)?)", temp_str)
+        match = _TEMP_RE.search(temp_str)
         if match:
             return match.group(1)
         return ""
 
     def get_weather(self, include_forecast: bool = False) -> str:
+        """获取天气，成功的结果按 (城市代码, 是否含预报) 缓存 WEATHER_CACHE_TTL 秒"""
+        key = (str(self.city_code), include_forecast)
+        now = time.time()
+        with _weather_cache_lock:
+            entry = _weather_cache.get(key)
+            if entry is not None and now - entry[0] < WEATHER_CACHE_TTL:
+                return entry[1]
+
+        ok, result = self._fetch_weather(include_forecast)
+        if ok:
+            with _weather_cache_lock:
+                _weather_cache[key] = (time.time(), result)
+        return result
+
+    def _fetch_weather(self, include_forecast: bool) -> Tuple[bool, str]:
+        """请求天气接口，返回 (是否成功, 天气文本或失败提示)"""
         # api地址
         url = 'http://t.weather.sojson.com/api/weather/city/'
 
@@ -28,17 +56,17 @@ class Weather:
             self.LOG.info(f"获取天气成功: 状态码={response.status_code}")
             if response.status_code != 200:
                 self.LOG.error(f"API返回非200状态码: {response.status_code}")
-                return f"获取天气失败: 服务器返回状态码 {response.status_code}"
+                return False, f"获取天气失败: 服务器返回状态码 {response.status_code}"
         except Exception as e:
             self.LOG.error(f"获取天气失败: {str(e)}")
-            return "由于网络原因，获取天气失败"
+            return False, "由于网络原因，获取天气失败"
 
         try:
             # 将数据以json形式返回，这个d就是返回的json数据
             d = response.json()
         except json.JSONDecodeError as e:
             self.LOG.error(f"解析JSON失败: {str(e)}")
-            return "获取天气失败: 返回数据格式错误"
+            return False, "获取天气失败: 返回数据格式错误"
 
         # 当返回状态码为200，输出天气状况
         if(d.get('status') == 200):
@@ -48,7 +76,7 @@ class Weather:
             
             if not forecast:
                 self.LOG.warning("API返回的数据中没有forecast字段")
-                return "获取天气失败: 数据不完整"
+                return False, "获取天气失败: 数据不完整"
                 
             today = forecast[0] if forecast else {}
             
@@ -85,9 +113,9 @@ class Weather:
                     # 简化格式：只显示周几、温度范围和天气类型
                     result.append(f"- 周{week_char} {temp_range} {weather_type}")
             
-            return "\n".join(result)
+            return True, "\n".join(result)
         else:
-            return "获取天气失败"
+            return False, "获取天气失败"
 
 if __name__ == "__main__":
     # 设置测试用的日志配置
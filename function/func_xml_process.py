@@ -769,7 +769,10 @@ class XmlProcessor:
                          result["card_appname"] = html.unescape(appname_direct)
 
                 # 记录提取结果用于调试
-                self.logger.debug(f"ElementTree 解析结果: type={result['card_type']}, title={result['card_title']}, desc_len={len(result['card_description'])}, url_len={len(result['card_url'])}, app={result['card_appname']}, source={result['card_sourcedisplayname']}")
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("ElementTree 解析结果: type=%s, title=%s, desc_len=%s, url_len=%s, app=%s, source=%s",
+                                      result['card_type'], result['card_title'], len(result['card_description']),
+                                      len(result['card_url']), result['card_appname'], result['card_sourcedisplayname'])
 
             except ET.ParseError as e:
                 self.logger.error(f"使用 ElementTree 解析 <appmsg> 时出错: {e}\nXML 内容片段: {appmsg_xml_str[:500]}...", exc_info=True)